@@ -3,6 +3,8 @@ from functools import wraps
 from rest_framework import status
 from rest_framework.response import Response
 
+default_app_config = 'django_rest_params.apps.DjangoRestParamsConfig'
+
 
 def params(**kwargs):
     """
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class DjangoRestParamsConfig(AppConfig):
+
+    """ Add 'django_rest_params' to INSTALLED_APPS so the lookup field system check is registered even before any views are imported """
+
+    name = 'django_rest_params'
+    verbose_name = 'Django REST Params'
+
+    def ready(self):
+        from django_rest_params import checks  # noqa: registers check_lookup_fields
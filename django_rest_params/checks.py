@@ -0,0 +1,126 @@
+import threading
+
+from django.conf import settings
+from django.core import checks
+from django.db import DatabaseError, connections, router, transaction
+
+try:
+    from django.urls import get_resolver
+except ImportError:  # Django < 2.0
+    from django.core.urlresolvers import get_resolver
+
+SETTINGS = getattr(settings, 'DJANGO_REST_PARAMS', {})
+CHECK_QUERY_PLAN = SETTINGS.get('CHECK_QUERY_PLAN', False)  # also EXPLAIN each lookup on SQLite/Postgres to make sure it uses an index
+
+_lookups = []  # (model, field, view fn) for every model param
+_lookups_lock = threading.Lock()
+
+
+def register_lookup(model, field, fn):
+    """ Record that fn looks up model instances by field, so check_lookup_fields() can check it """
+    with _lookups_lock:
+        _lookups.append((model, field, fn))
+
+
+def _load_views():
+    """
+        Import the URLconf (and so every view it points to), so the model params of views that are only imported through it
+        have been registered before we check them. Problems with the URLconf itself are left for Django's own checks to report.
+    """
+    if not getattr(settings, 'ROOT_URLCONF', None):
+        return
+    try:
+        get_resolver(None).url_patterns
+    except Exception:
+        pass
+
+
+def _view_label(fn):
+    return '%s.%s' % (fn.__module__, getattr(fn, '__qualname__', fn.__name__))
+
+
+def _is_indexed(meta, field):
+    """ Whether there's an index that starts with field """
+    if field.primary_key or field.unique or field.db_index:
+        return True
+    names = (field.name, getattr(field, 'attname', field.name))
+    for fields in tuple(getattr(meta, 'index_together', ())) + tuple(getattr(meta, 'unique_together', ())):
+        if fields and fields[0] in names:
+            return True
+    for index in getattr(meta, 'indexes', ()):
+        if index.fields and index.fields[0] in names:
+            return True
+    return False
+
+
+def _query_plan_uses_index(model, field_name):
+    """ True/False if EXPLAIN says the lookup does/doesn't use an index, or None if we can't tell (other DBs, empty tables, etc.) """
+    db = router.db_for_read(model)
+    connection = connections[db]
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return None
+    try:
+        value = model._default_manager.using(db).values_list(field_name, flat=True)[:1]
+        if not value:
+            return None
+        sql, params = model._default_manager.using(db).filter(**{field_name: value[0]}).only('pk').query.sql_with_params()
+        with transaction.atomic(using=db):
+            with connection.cursor() as cursor:
+                if connection.vendor == 'sqlite':
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                    plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+                    return 'SEARCH' in plan
+                # make Postgres use an index if there's any index it can use, even for tiny tables
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql, params)
+                plan = ' '.join(row[0] for row in cursor.fetchall())
+                return 'Seq Scan' not in plan
+    except DatabaseError:
+        return None
+
+
+def check_lookup_fields(app_configs=None, **kwargs):
+    """
+        System check for model params: the lookup field (__field, 'id' by default) should be unique, so .get() can't
+        raise MultipleObjectsReturned, and indexed, so the lookup isn't a table scan.
+    """
+    _load_views()
+    with _lookups_lock:
+        lookups = list(_lookups)
+
+    messages = []
+    seen = set()
+    for model, field_name, fn in lookups:
+        meta = getattr(model, '_meta', None)
+        if meta is None or not hasattr(meta, 'get_field') or '__' in field_name:
+            continue  # not a real model, or a lookup that spans relations, which we can't check
+        if app_configs is not None and getattr(meta, 'app_config', None) not in app_configs:
+            continue
+        view = _view_label(fn)
+        if (model, field_name, view) in seen:
+            continue
+        seen.add((model, field_name, view))
+
+        label = '%s.%s' % (model.__name__, field_name)
+        try:
+            field = meta.pk if field_name == 'pk' else meta.get_field(field_name)
+        except Exception:
+            messages.append(checks.Error("Looks up %s by '%s', which isn't a field." % (model.__name__, field_name),
+                                         obj=view, id='django_rest_params.E001'))
+            continue
+
+        if not (field.primary_key or field.unique):
+            messages.append(checks.Warning("Looks up %s by %s, which isn't unique, so it can raise MultipleObjectsReturned." % (model.__name__, label),
+                                           hint='Add unique=True to %s, or look it up by a unique field.' % label,
+                                           obj=view, id='django_rest_params.W001'))
+        if not _is_indexed(meta, field):
+            messages.append(checks.Warning("Looks up %s by %s, which isn't indexed, so every lookup is a table scan." % (model.__name__, label),
+                                           hint='Add db_index=True (or unique=True) to %s.' % label,
+                                           obj=view, id='django_rest_params.W002'))
+        elif CHECK_QUERY_PLAN and _query_plan_uses_index(model, field.name) is False:
+            messages.append(checks.Warning("Looks up %s by %s, but the query plan for it doesn't use an index." % (model.__name__, label),
+                                           obj=view, id='django_rest_params.W003'))
+    return messages
+
+
+checks.register(check_lookup_fields, checks.Tags.models)
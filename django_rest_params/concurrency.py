@@ -0,0 +1,71 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+try:
+    from concurrent.futures import ThreadPoolExecutor  # on Python 2, this needs the 'futures' backport
+except ImportError:
+    ThreadPoolExecutor = None
+
+SETTINGS = getattr(settings, 'DJANGO_REST_PARAMS', {})
+CONCURRENT_LOOKUP_THREADS = SETTINGS.get('CONCURRENT_LOOKUP_THREADS', 8)  # size of the thread pool shared by every _concurrent endpoint
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=CONCURRENT_LOOKUP_THREADS)
+        return _pool
+
+
+def _close_unusable_connections():
+    """
+        Like django.db.close_old_connections(), but for the pool threads' connections, which are kept open between lookups even with
+        CONN_MAX_AGE = 0 (there are only CONCURRENT_LOOKUP_THREADS of them, and reconnecting for every lookup would cost more than
+        doing the lookups at the same time saves). They're closed if they're unusable, or older than a CONN_MAX_AGE above 0.
+    """
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        if connection.get_autocommit() != connection.settings_dict['AUTOCOMMIT']:
+            connection.close()
+            continue
+        if connection.errors_occurred:
+            if not connection.is_usable():
+                connection.close()
+                continue
+            connection.errors_occurred = False
+        if connection.settings_dict['CONN_MAX_AGE'] and connection.close_at is not None and time.time() >= connection.close_at:
+            connection.close()
+
+
+def _run(fn, *args):
+    """ Run fn(*args) on a pool thread, closing its DB connections before and after if they're broken or too old """
+    _close_unusable_connections()
+    try:
+        return fn(*args)
+    finally:
+        _close_unusable_connections()
+
+
+def run_concurrently(calls):
+    """
+        Call fn(*args) for each (fn, arg, arg, ...) tuple in calls on the shared thread pool.
+        Returns a list of (result, exception) tuples in the same order as calls, once they've all finished.
+    """
+    if ThreadPoolExecutor is None:
+        raise Exception('_concurrent needs concurrent.futures (pip install django-rest-params[concurrent] on Python 2)')
+    futures = [_get_pool().submit(_run, *call) for call in calls]
+    results = []
+    for future in futures:
+        try:
+            results.append((future.result(), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
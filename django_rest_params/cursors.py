@@ -0,0 +1,146 @@
+import datetime
+import json
+import operator
+import uuid
+from decimal import Decimal
+from functools import reduce
+
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+
+from django_rest_params.types import ParamType
+
+# type tag -> fn to turn the encoded text back into a value. Checked in order when encoding, so datetime comes before date
+_CURSOR_TYPES = (
+    ('datetime', datetime.datetime, parse_datetime),
+    ('date', datetime.date, parse_date),
+    ('time', datetime.time, parse_time),
+    ('decimal', Decimal, Decimal),
+    ('uuid', uuid.UUID, uuid.UUID),
+)
+_DECODERS = dict((tag, decode) for tag, _, decode in _CURSOR_TYPES)
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+
+    """
+        Encodes datetimes, dates, times, Decimals and UUIDs losslessly as {"__type__": tag, "value": text}.
+        (DjangoJSONEncoder cuts datetimes down to milliseconds, which would make cursors skip or repeat rows.)
+    """
+
+    def default(self, o):
+        for tag, value_type, _ in _CURSOR_TYPES:
+            if isinstance(o, value_type):
+                return {'__type__': tag, 'value': o.isoformat() if hasattr(o, 'isoformat') else str(o)}
+        return super(_CursorEncoder, self).default(o)
+
+
+def _decode_value(obj):
+    decode = _DECODERS.get(obj.get('__type__'))
+    if decode is None or len(obj) != 2 or 'value' not in obj:
+        return obj
+    value = decode(obj['value'])
+    if value is None:  # parse_* return None for malformed values
+        raise ValueError('invalid %s' % obj['__type__'])
+    return value
+
+
+class _CursorSerializer(signing.JSONSerializer):
+
+    """ JSONSerializer that round-trips datetimes, dates, times, Decimals and UUIDs """
+
+    def dumps(self, obj):
+        return _CursorEncoder(separators=(',', ':')).encode(obj).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'), object_hook=_decode_value)
+
+
+class CursorPosition(object):
+
+    """ A decoded keyset cursor: the ordering it was made for and the last-seen value of each ordering field """
+
+    def __init__(self, ordering, values):
+        self.ordering = ordering
+        self.values = values
+
+    def q(self):
+        """
+            Q object matching rows that come after this position, e.g. for ordering ('-created', 'id'):
+            Q(created__lt=c) | Q(created=c, id__gt=i)
+        """
+        qs = []
+        equal = {}
+        for field, value in zip(self.ordering, self.values):
+            name = field.lstrip('-')
+            lookup = '%s__%s' % (name, 'lt' if field.startswith('-') else 'gt')
+            qs.append(Q(**dict(equal, **{lookup: value})))
+            equal[name] = value
+        return reduce(operator.or_, qs)
+
+    def filter(self, query_set):
+        """ Filter a QuerySet (which should be ordered by self.ordering) to the rows after this position """
+        return query_set.filter(self.q())
+
+
+class Cursor(object):
+
+    """
+        Param type for opaque, signed keyset pagination cursors.
+
+            THINGS_CURSOR = Cursor('-created', 'id')
+
+            @params(after=THINGS_CURSOR, after__optional=True)
+            def list_things(request, after):
+                things = Thing.objects.order_by(*THINGS_CURSOR.ordering)
+                if after:
+                    things = after.filter(things)
+                page = list(things[:50])
+                next_cursor = THINGS_CURSOR.encode(page[-1]) if page else None
+
+        The param is passed to the wrapped function as a CursorPosition.
+        Cursors are signed with SECRET_KEY (and the ordering), so tampered cursors or cursors for a different ordering are rejected.
+    """
+
+    max_length = 1024  # reject anything longer than this before trying to decode it
+
+    def __init__(self, *ordering, **kwargs):
+        if not ordering:
+            raise Exception('Cursor needs at least one ordering field')
+        self.ordering = ordering
+        self.max_age = kwargs.pop('max_age', None)  # seconds
+        self.max_length = kwargs.pop('max_length', self.max_length)
+        if kwargs:
+            raise Exception('Invalid option(s) for Cursor: %s' % ', '.join(kwargs))
+        self.salt = 'django_rest_params.cursors:' + ','.join(ordering)
+
+    def encode(self, obj):
+        """ Encode the cursor for the position after obj, a model instance (or dict) that is the last item of the current page """
+        if isinstance(obj, dict):
+            values = [obj[field.lstrip('-')] for field in self.ordering]
+        else:
+            values = [getattr(obj, field.lstrip('-')) for field in self.ordering]
+        return signing.dumps(values, salt=self.salt, serializer=_CursorSerializer)
+
+    def decode(self, cursor):
+        """ Decode a cursor made by encode(), or raise an Exception if it's malformed, tampered with, or expired """
+        if len(cursor) > self.max_length:
+            raise Exception('invalid cursor')
+        try:
+            values = signing.loads(cursor, salt=self.salt, serializer=_CursorSerializer, max_age=self.max_age)
+        except signing.SignatureExpired:
+            raise Exception('cursor has expired')
+        except Exception:
+            raise Exception('invalid cursor')
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise Exception('invalid cursor')
+        return CursorPosition(self.ordering, values)
+
+    def as_param_type(self):
+        """ How @params handles this cursor as a param type: decode() raw values into CursorPositions, which can't be memoized (they can expire) """
+        return ParamType(self.decode, max_raw_length=lambda lower, upper: self.max_length, converted_type=CursorPosition, memoizable=False)
+
+    def __repr__(self):
+        return 'Cursor(%s)' % ', '.join(repr(f) for f in self.ordering)
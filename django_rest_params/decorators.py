@@ -1,13 +1,21 @@
-import sys
+import datetime
 from functools import wraps
 
 from django.conf import settings
 from rest_framework import status
 from rest_framework.response import Response
 
+from django_rest_params.checks import register_lookup
+from django_rest_params.concurrency import ThreadPoolExecutor, run_concurrently
+from django_rest_params.id_index import get_id_index
+from django_rest_params.memo import MEMOIZE_MAX_VALUE_LENGTH, LRUCache
+from django_rest_params.model_cache import ModelCache
+from django_rest_params.params_object import make_params_class
+from django_rest_params.types import get_type, normalize_datetime, string_types, text_type
+
 SETTINGS = getattr(settings, 'DJANGO_REST_PARAMS', {})
-TRUE_VALUES = SETTINGS.get('TRUE_VALUES', ('1', 'true'))
-FALSE_VALUES = SETTINGS.get('FALSE_VALUES', ('0', 'false'))
+MAX_RAW_LENGTH = SETTINGS.get('MAX_RAW_LENGTH', None)  # global cap on the length of any raw param value (str, or list for __many)
+MANY_MAX_ITEMS = SETTINGS.get('MANY_MAX_ITEMS', 1000)  # default cap on the number of values for __many params
 
 
 def params(**kwargs):
@@ -18,10 +26,6 @@ def params(**kwargs):
 
     # Types that we'll all for as 'tuple' params
     TUPLE_TYPES = tuple, set, frozenset, list
-    if (sys.version_info > (3, 0)):
-        VALID_TYPES = int, float, str, bool
-    else:
-        VALID_TYPES = int, float, str, unicode, bool
 
     class ParamValidator(object):
         # name
@@ -29,6 +33,10 @@ def params(**kwargs):
 
         # type
         param_type = None
+        converted_type = None  # type of the converted values, so fn.call() can skip converting values that already have it
+        converter = None  # from the type registry, for registered types
+        memoizable = True  # whether the result of validating this param depends only on the raw value (i.e., it's not a model or cursor)
+        compare = None  # what value checks compare against, e.g. len for str
 
         # method - explicitly allow a certain method. If both are false we'll use defaults
         allow_GET = False
@@ -41,80 +49,171 @@ def params(**kwargs):
         lte = None
         eq = None
 
+        # longest raw str we'll try to convert. If not set, it's derived from the type and value validators, e.g. digits for an int with gte and lte
+        max_raw_length = None
+
         # optional
         optional = False
         default = None
 
         # multiple vals
         many = False
+        max_items = MANY_MAX_ITEMS  # most values we'll convert (and, for models, look up) for a __many param
 
         # django models only
         deferred = True
         field = 'id'
+        index = False  # reject IDs that aren't in the in-memory ID index before querying the DB
+        id_index = None
+        cache = False  # share lookups between worker processes with a Django cache backend
+        model_cache = None
 
         def __init__(self, arg_name, **kwargs):
             self.param_name = arg_name
             for k, v in kwargs.items():
                 setattr(self, k, v)
 
+
+        def find(self, request, default_param_method):
+            """ Find the raw value of this param in the request. Returns a (param, param_source) tuple, where param_source is 'GET' or 'POST' """
+            # what methods are allowed?
+            use_default_methods = not self.allow_GET and not self.allow_POST
+            allow_GET = (default_param_method == 'GET') if use_default_methods else self.allow_GET
+            allow_POST = (default_param_method == 'POST') if use_default_methods else self.allow_POST
+
+            # find the param
+            param = None
+            param_source = None
+            if allow_POST:
+                param = request.DATA.get(self.param_name, None)
+                param_source = 'POST'
+            if not param and allow_GET:
+                param = request.GET.get(self.param_name, None)
+                param_source = 'GET'
+            return param, param_source
+
+        def validate(self, param, param_source):
+            """ Convert and check a raw param, or raise an Exception. Returns the default if param is missing and optional. """
+            # optional/default
+            if param is None:  # but not False, because that's a valid boolean param
+                if not self.optional:
+                    raise Exception('Param is missing')
+                return self.default
+
+            if MAX_RAW_LENGTH is not None and isinstance(param, string_types + (list, tuple)) and len(param) > MAX_RAW_LENGTH:
+                raise Exception('Value is too long: must be at most %d characters' % MAX_RAW_LENGTH)
+
+            # check type, value
+            if self.many:
+                self.check_num_items(param, param_source)
+                if param_source == 'GET':
+                    params = str(param).split(',')
+                else:
+                    params = param if isinstance(param, list) else (param,)
+                params = [self.check_type(p) for p in params]
+                [self.check_value(p) for p in params]
+                return params
+
+            param = self.check_type(param)
+            self.check_value(param)
+            return param
+
+        def check_direct(self, param):
+            """ check_type() and check_value() for a plain Python value passed to fn.call(). Values that already have the right type aren't converted. """
+            if not self.has_converted_type(param):
+                param = self.check_type(param)
+            elif isinstance(param, datetime.datetime):
+                param = normalize_datetime(param)  # aware/naive, the same as if we'd parsed it
+            self.check_value(param)
+            return param
+
+        def has_converted_type(self, param):
+            """ Whether param already has the type check_type() converts to. Exact for everything but models, since e.g. a datetime is also a date """
+            if not self.converted_type:
+                return False
+            if hasattr(self.param_type, '_default_manager'):
+                return isinstance(param, self.converted_type)
+            return type(param) is self.converted_type
+
+        def validate_direct(self, param):
+            """ Like validate(), but for a plain Python value passed to fn.call() instead of a raw value from a request """
+            if param is None:
+                if not self.optional:
+                    raise Exception('Param is missing')
+                return self.default
+            if self.many:
+                params = param if isinstance(param, TUPLE_TYPES) else (param,)
+                self.check_num_items(params, None)
+                return [self.check_direct(p) for p in params]
+            return self.check_direct(param)
+
+        def check_num_items(self, param, param_source):
+            """ For __many params, raise an Exception if there are more than max_items values, before converting any of them """
+            if self.max_items is None:
+                return
+            if param_source == 'GET':
+                num_items = str(param).count(',') + 1  # don't split a huge string just to find out it's too long
+            else:
+                num_items = len(param) if isinstance(param, TUPLE_TYPES) else 1
+            if num_items > self.max_items:
+                raise Exception('Too many values: must be at most %d' % self.max_items)
+
         def check_type(self, param):
             """ Check that the type of param is valid, or raise an Exception. This doesn't take self.many into account. """
-            valid_type = True
+            if self.max_raw_length is not None and isinstance(param, string_types) and len(param) > self.max_raw_length:
+                raise Exception('Value is too long: must be at most %d characters' % self.max_raw_length)
+
             if isinstance(self.param_type, TUPLE_TYPES):
                 if not param in self.param_type:
                     raise Exception('invalid option "%s": Must be one of: %s' % (param, self.param_type))
-            else:
-                if self.param_type == int:
-                    param = int(param)
-                elif self.param_type == float:
-                    param = float(param)
-                elif self.param_type == str:
-                    assert(isinstance(param, (str, unicode)))
-                    param = unicode(param)
-                elif self.param_type == bool:
-                    param = str(param).lower()  # bool isn't case sensitive
-                    if param in TRUE_VALUES:
-                        param = True
-                    elif param in FALSE_VALUES:
-                        param = False
-                    else:
-                        raise Exception('%s is not a valid bool: must be one of: %s', param, TRUE_VALUES + FALSE_VALUES)
-                elif hasattr(self.param_type, '_default_manager'):  # isinstance(django.models.Model) doesn't seem to work, but this is a good tell
-                    query_set = self.param_type.objects
-                    if self.deferred:
-                        query_set = query_set.only('id')
-                    param = query_set.get(**{self.field: param})
+            elif self.converter:
+                param = self.converter(param)
+            elif hasattr(self.param_type, '_default_manager'):  # isinstance(django.models.Model) doesn't seem to work, but this is a good tell
+                if self.id_index and not self.id_index.might_contain(param):
+                    raise Exception('%s matching query does not exist.' % self.param_type.__name__)
+                query_set = self.param_type.objects
+                if self.deferred:
+                    query_set = query_set.only('id')
+                if self.model_cache:
+                    lookup = {self.field: param}
+                    param = self.model_cache.get(param, lambda: query_set.get(**lookup))
                 else:
-                    valid_type = False
-            if not valid_type:
-                raise Exception("Invalid param type: %s" % self.param_type.____name__)
+                    param = query_set.get(**{self.field: param})
+            else:
+                raise Exception("Invalid param type: %s" % self.param_type.__name__)
             return param
 
         def check_value(self, param):
             """ Check that a single value is lt/gt/etc. Doesn't take self.many into account. """
-            val = None
-            if self.param_type == int or self.param_type == float:
-                val = param
-            elif self.param_type == str:
-                val = len(param)
-            if val:
+            if not self.compare:
+                return
+            val = self.compare(param)
+            if val is not None:
                 try:
-                    if self.eq and val != self.eq:
-                        raise Exception("must be less than %s!" % self.eq)
+                    if self.eq is not None and val != self.eq:
+                        raise Exception("must be equal to %s!" % self.eq)
                     else:
-                        if self.lt and val >= self.lt:
+                        if self.lt is not None and val >= self.lt:
                             raise Exception("must be less than %s!" % self.lt)
-                        if self.lte and val > self.lte:
+                        if self.lte is not None and val > self.lte:
                             raise Exception("must be less than or equal to %s!" % self.lte)
-                        if self.gt and val <= self.gt:
+                        if self.gt is not None and val <= self.gt:
                             raise Exception("must be greater than %s!" % self.gt)
-                        if self.gte and val < self.gte:
+                        if self.gte is not None and val < self.gte:
                             raise Exception("must be greater than or equal to %s!" % self.gte)
                 except Exception as e:
                     msg = str(e)
-                    msg = ("Length " if self.param_type == str else 'Value ') + msg
+                    msg = ("Length " if self.compare is len else 'Value ') + msg
                     raise Exception(msg)
 
+    # endpoint-wide options start with an underscore
+    memoize = kwargs.pop('_memoize', False)
+    as_object = kwargs.pop('_as_object', False)
+    concurrent = kwargs.pop('_concurrent', False)
+    for k in kwargs:
+        if k.startswith('_'):
+            raise Exception("Invalid option: '%s'" % k)
+
     validators = {}
 
     for k, v in kwargs.items():
@@ -127,8 +226,12 @@ def params(**kwargs):
 
         if (len(parts) == 1):
             # set type
-            if not hasattr(v, '_default_manager'):  # django model
-                if not isinstance(v, TUPLE_TYPES) and not v in VALID_TYPES:
+            registered_type = get_type(v)
+            if registered_type:
+                obj.converter = registered_type.converter
+                obj.compare = registered_type.compare
+            elif not hasattr(v, '_default_manager'):  # django model
+                if not isinstance(v, TUPLE_TYPES):
                     raise Exception("Invalid type for %s: %s is not a valid type" % (k, v))
             obj.param_type = v
         else:
@@ -157,7 +260,7 @@ def params(**kwargs):
                 obj.param_name = v
                 continue
 
-            BOOL_PARTS = 'deferred', 'optional', 'many'
+            BOOL_PARTS = 'deferred', 'optional', 'many', 'index', 'cache'
             if last_part in BOOL_PARTS:
                 assert(isinstance(v, bool))
                 setattr(obj, last_part, v)
@@ -165,7 +268,7 @@ def params(**kwargs):
 
             NUM_PARTS = 'gt', 'gte', 'lt', 'lte', 'eq'
             if last_part in NUM_PARTS:
-                assert(isinstance(v, int) or isinstance(v, float))
+                assert(v is not None)
                 setattr(obj, last_part, v)
                 continue
 
@@ -174,6 +277,16 @@ def params(**kwargs):
                 obj.default = v
                 continue
 
+            if last_part == 'max_raw_length':
+                assert(isinstance(v, int))
+                obj.max_raw_length = v
+                continue
+
+            if last_part == 'max_items':
+                assert(v is None or isinstance(v, int))
+                obj.max_items = v
+                continue
+
             if last_part == 'field':
                 assert(isinstance(last_part, str))
                 obj.field = v
@@ -181,7 +294,92 @@ def params(**kwargs):
 
             raise Exception("Invalid option: '__%s' in param '%s'" % (last_part, k))
 
+    for param_key, obj in validators.items():
+        for option in 'index', 'cache':
+            if getattr(obj, option) and not hasattr(obj.param_type, '_default_manager'):
+                raise Exception("Invalid option: '__%s' in param '%s': only valid for Django models" % (option, param_key))
+        if obj.index:
+            obj.id_index = get_id_index(obj.param_type, obj.field)
+        if obj.cache:
+            obj.model_cache = ModelCache(obj.param_type, obj.field, obj.deferred)
+        registered_type = get_type(obj.param_type)
+        if registered_type:
+            obj.converted_type = registered_type.converted_type or (text_type if obj.param_type in string_types else obj.param_type)
+            obj.memoizable = registered_type.memoizable
+        elif hasattr(obj.param_type, '_default_manager'):
+            obj.converted_type = obj.param_type
+            obj.memoizable = False
+        if obj.param_type is datetime.datetime:
+            # compare like with like: parsed datetimes are aware if USE_TZ is on and naive if it's off
+            for option in 'gt', 'gte', 'lt', 'lte', 'eq':
+                bound = getattr(obj, option)
+                if isinstance(bound, datetime.datetime):
+                    setattr(obj, option, normalize_datetime(bound))
+        if obj.max_raw_length is None and registered_type and registered_type.max_raw_length:
+            lower = obj.gte if obj.gte is not None else obj.gt
+            upper = obj.lte if obj.lte is not None else obj.lt
+            if obj.eq is not None:
+                lower = upper = obj.eq
+            obj.max_raw_length = registered_type.max_raw_length(lower, upper)
+
+    # Check the params that don't need a DB query first, so we don't do any queries for requests we're going to reject anyway.
+    # With _memoize, the results for all of those are cached together, keyed by their raw values.
+    ordered_validators = sorted(validators.items(), key=lambda item: (not item[1].memoizable, hasattr(item[1].param_type, '_default_manager'), item[0]))
+    arg_names = [arg_name for arg_name, _ in ordered_validators]
+    memo = None
+    memoized_validators = []
+    if memoize:
+        memo = LRUCache() if memoize is True else LRUCache(memoize)
+        memoized_validators = [item for item in ordered_validators if item[1].memoizable]
+    fresh_validators = ordered_validators[len(memoized_validators):]
+
+    # With _concurrent, the model params (which come last) are looked up at the same time on a shared thread pool
+    concurrent_validators = []
+    if concurrent:
+        if ThreadPoolExecutor is None:
+            raise Exception('_concurrent needs concurrent.futures (pip install django-rest-params[concurrent] on Python 2)')
+        concurrent_validators = [item for item in fresh_validators if hasattr(item[1].param_type, '_default_manager')]
+        if len(concurrent_validators) < 2:
+            concurrent_validators = []
+    sequential_validators = fresh_validators[:len(fresh_validators) - len(concurrent_validators)]
+    first_concurrent_index = len(ordered_validators) - len(concurrent_validators)
+
+    # With _as_object, the params are passed to the fn as a single tuple-backed object instead of separate kwargs
+    params_kwarg = None
+    params_class = None
+    if as_object:
+        params_kwarg = 'params' if as_object is True else as_object
+        params_class = make_params_class(arg_names)
+
+    def error_message(validator, e):
+        return 'Invalid param "%s": %s' % (validator.param_name, str(e))
+
+    def add_params(kwargs, values, supplied):
+        """ Add the validated values to the kwargs for fn, either one kwarg per param or as a single params object """
+        if params_class:
+            values.append(supplied)
+            kwargs[params_kwarg] = params_class(values)
+        else:
+            kwargs.update(zip(arg_names, values))
+        return kwargs
+
+    def validate_memoized(found):
+        """ Validate the memoizable params. Returns (error, None, None) or (None, values, supplied bitmask) """
+        values = []
+        supplied = 0
+        for i, ((arg_name, validator), (param, param_source)) in enumerate(zip(memoized_validators, found)):
+            if param is not None:
+                supplied |= 1 << i
+            try:
+                values.append(validator.validate(param, param_source))
+            except Exception as e:
+                return error_message(validator, e), None, None
+        return None, tuple(values), supplied
+
     def _params(fn):
+        for arg_name, validator in ordered_validators:
+            if hasattr(validator.param_type, '_default_manager'):
+                register_lookup(validator.param_type, validator.field, fn)
 
         @wraps(fn)
         def wrapped_request_fn(first_arg, *args, **kwargs):
@@ -193,50 +391,72 @@ def params(**kwargs):
 
             request_method = request.META['REQUEST_METHOD']
             default_param_method = 'POST' if request_method == 'POST' or request_method == 'PUT' else 'GET'
-            # Validate the params
-            for arg_name, validator in validators.items():
-                param_name = validator.param_name
-
-                # what methods are allowed?
-                use_default_methods = not validator.allow_GET and not validator.allow_POST
-                allow_GET = (default_param_method == 'GET') if use_default_methods else validator.allow_GET
-                allow_POST = (default_param_method == 'POST') if use_default_methods else validator.allow_POST
-
-                # find the param
-                param = None
-                if allow_POST:
-                    param = request.DATA.get(param_name, None)
-                    param_type = 'POST'
-                if not param and allow_GET:
-                    param = request.GET.get(param_name, None)
-                    param_type = 'GET'
 
-                try:
-                    # optional/default
-                    if param is None:  # but not False, because that's a valid boolean param
-                        if not validator.optional:
-                            raise Exception('Param is missing')
-                        else:
-                            kwargs[arg_name] = validator.default
-                            continue
-
-                    # check type, value
-                    if validator.many:
-                        if param_type == 'GET':
-                            params = str(param).split(',')
-                        else:
-                            params = param if isinstance(param, list) else (param,)
-                        params = [validator.check_type(p) for p in params]
-                        [validator.check_value(p) for p in params]
-                    else:
-                        param = validator.check_type(param)
-                        validator.check_value(param)
+            values = []
+            supplied = 0
+            if memo:
+                found = tuple(validator.find(request, default_param_method) for _, validator in memoized_validators)
+                key = memoized = None
+                # include the types in the key, since 0.0 == False == 0 but they don't all validate the same way.
+                # don't memoize long values (they'd take up a lot of room, and probably aren't repeated anyway)
+                if all(len(param) <= MEMOIZE_MAX_VALUE_LENGTH for param, _ in found if isinstance(param, string_types)):
+                    key = tuple((type(param), param, param_source) for param, param_source in found)
+                    try:
+                        memoized = memo.get(key)
+                    except TypeError:  # unhashable, e.g. a list from a JSON body, so we can't memoize this one
+                        key = None
+                if memoized is None:
+                    memoized = validate_memoized(found)
+                    if key is not None:
+                        memo.set(key, memoized)
+                error, memoized_values, supplied = memoized
+                if error:
+                    return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+                values = [list(value) if isinstance(value, list) else value for value in memoized_values]  # don't let the fn modify the memoized lists
 
+            # Validate the params
+            for i, (arg_name, validator) in enumerate(sequential_validators, len(memoized_validators)):
+                param, param_source = validator.find(request, default_param_method)
+                if param is not None:
+                    supplied |= 1 << i
+                try:
+                    values.append(validator.validate(param, param_source))
                 except Exception as e:
-                    return Response({'error': 'Invalid param "%s": %s' % (param_name, str(e))}, status=status.HTTP_400_BAD_REQUEST)
-
-                kwargs[arg_name] = params if validator.many else param
+                    return Response({'error': error_message(validator, e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            if concurrent_validators:
+                found = [validator.find(request, default_param_method) for _, validator in concurrent_validators]
+                results = run_concurrently([(validator.validate, param, param_source) for (_, validator), (param, param_source) in zip(concurrent_validators, found)])
+                # report the first error in the same order as if we'd done the lookups one at a time
+                for i, ((arg_name, validator), (param, _), (value, e)) in enumerate(zip(concurrent_validators, found, results), first_concurrent_index):
+                    if e is not None:
+                        return Response({'error': error_message(validator, e)}, status=status.HTTP_400_BAD_REQUEST)
+                    if param is not None:
+                        supplied |= 1 << i
+                    values.append(value)
+
+            return fn(first_arg, *args, **add_params(kwargs, values, supplied))
+
+        def call(*args, **kwargs):
+            """
+                Call fn directly, without a request, e.g. my_view.call(None, user=user, offset=20), or MyViewSet.list.call(viewset, request, ...)
+                Params are passed by their arg names (not __name). They're checked and converted just like params from a request,
+                except that values that already have the right type (e.g. a User instead of a user ID) aren't converted again.
+                Raises an Exception if any param is invalid. Any other kwargs are passed to fn as-is.
+            """
+            values = []
+            supplied = 0
+            for i, (arg_name, validator) in enumerate(ordered_validators):
+                param = kwargs.pop(arg_name, None)
+                if param is not None:
+                    supplied |= 1 << i
+                try:
+                    values.append(validator.validate_direct(param))
+                except Exception as e:
+                    raise Exception(error_message(validator, e))
+            return fn(*args, **add_params(kwargs, values, supplied))
 
-            return fn(first_arg, *args, **kwargs)
+        wrapped_request_fn.memo = memo
+        wrapped_request_fn.call = call
         return wrapped_request_fn
     return _params
@@ -0,0 +1,181 @@
+import hashlib
+import math
+import numbers
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_save
+
+SETTINGS = getattr(settings, 'DJANGO_REST_PARAMS', {})
+ID_INDEX_EXACT_MAX = SETTINGS.get('ID_INDEX_EXACT_MAX', 100000)
+ID_INDEX_FALSE_POSITIVE_RATE = SETTINGS.get('ID_INDEX_FALSE_POSITIVE_RATE', 0.01)
+ID_INDEX_MAX_AGE = SETTINGS.get('ID_INDEX_MAX_AGE', 60)  # seconds before an index is rebuilt, to pick up rows saved by other processes
+
+
+def _key(value):
+    """ Normalize a value to the text form we hash / store, so '7' from a query string matches 7 from the DB """
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    return u'%s' % value
+
+
+class ExactSet(object):
+
+    """ Exact membership set. Used for tables small enough to keep every value in memory. """
+
+    def __init__(self, values=()):
+        self._values = set(_key(v) for v in values)
+
+    def add(self, value):
+        self._values.add(_key(value))
+
+    def __contains__(self, value):
+        return _key(value) in self._values
+
+    def __len__(self):
+        return len(self._values)
+
+
+class BloomFilter(object):
+
+    """ Bloom filter for large tables. Never gives false negatives, so anything it rejects definitely isn't in the table. """
+
+    def __init__(self, capacity, false_positive_rate=ID_INDEX_FALSE_POSITIVE_RATE, values=()):
+        capacity = max(int(capacity), 1)
+        self.num_bits = max(int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.num_bits / float(capacity) * math.log(2))), 1)
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        for value in values:
+            self.add(value)
+
+    def _positions(self, value):
+        # double hashing: derive all k positions from a single digest
+        digest = hashlib.md5(_key(value).encode('utf-8')).hexdigest()
+        h1 = int(digest[:16], 16)
+        h2 = int(digest[16:], 16) | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value):
+        bits = self._bits
+        for pos in self._positions(value):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class ModelIDIndex(object):
+
+    """
+        In-memory membership index for the values of one field of a Django model.
+        Built from the DB the first time it's needed (or explicitly with build()), rebuilt every ID_INDEX_MAX_AGE seconds, and added to on post_save.
+        Anything the index says isn't there is rejected without hitting the DB; possible hits still go through the normal .get().
+        Deleted values are never removed (the delete might get rolled back), so they're just harmless false positives, and integer values
+        bigger than any in the table at build time (e.g. new rows saved by other processes) are always possible hits.
+    """
+
+    def __init__(self, model, field='id'):
+        self.model = model
+        self.field = field
+        self._members = None
+        self._max_value = None  # largest value at build time, if they're all integers
+        self._built_at = None
+        self._pending = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()  # only one build at a time, since they share _pending
+        self._to_python = self._get_to_python()
+        post_save.connect(self._on_save, sender=model, weak=False)
+
+    @property
+    def built(self):
+        return self._members is not None
+
+    def _get_to_python(self):
+        """ The field's to_python(), so raw values like '007' or uppercase UUIDs match what's in the DB. None if we can't find the field """
+        meta = getattr(self.model, '_meta', None)
+        try:
+            field = meta.pk if self.field == 'pk' else meta.get_field(self.field)
+        except Exception:
+            return None  # not a real model, or a lookup that spans relations
+        return field.to_python
+
+    def build(self):
+        """ (Re)build the index from the DB. Saves that happen while we're reading the table are replayed afterwards. """
+        with self._build_lock:
+            self._build()
+
+    def _build(self):
+        with self._lock:
+            self._pending = []
+        values = list(self.model.objects.values_list(self.field, flat=True))
+        if len(values) <= ID_INDEX_EXACT_MAX:
+            members = ExactSet(values)
+        else:
+            members = BloomFilter(len(values) * 2, values=values)
+        max_value = max(values) if values and all(isinstance(value, numbers.Integral) for value in values) else None
+        with self._lock:
+            for value in self._pending:
+                members.add(value)
+            self._pending = None
+            self._max_value = max_value
+            self._built_at = time.time()
+            self._members = members
+
+    def might_contain(self, value):
+        """ False if value is definitely not in the table; True if it probably is. """
+        if self._members is None:
+            with self._build_lock:
+                if self._members is None:  # another thread might have built it while we were waiting
+                    self._build()
+        elif ID_INDEX_MAX_AGE is not None and time.time() - self._built_at > ID_INDEX_MAX_AGE:
+            # rebuild in this thread, unless another one is already doing it; either way, other threads keep using the old index meanwhile
+            if self._build_lock.acquire(False):
+                try:
+                    if time.time() - self._built_at > ID_INDEX_MAX_AGE:
+                        self._build()
+                finally:
+                    self._build_lock.release()
+        if self._to_python:
+            try:
+                value = self._to_python(value)
+            except ValidationError:
+                return False  # not a valid value for the field, so .get() wouldn't find it either
+        if self._max_value is not None and isinstance(value, numbers.Integral) and value > self._max_value:
+            return True  # newer than anything in the table when we built the index, so it might have been saved since
+        return value in self._members
+
+    def _on_save(self, sender, instance, **kwargs):
+        value = getattr(instance, self.field, None)
+        if value is None:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(value)
+            if self._members is not None:
+                self._members.add(value)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_id_index(model, field='id'):
+    """ Return the shared ModelIDIndex for model.field, creating it (but not building it) if needed """
+    with _indexes_lock:
+        index = _indexes.get((model, field))
+        if index is None:
+            index = _indexes[(model, field)] = ModelIDIndex(model, field)
+        return index
+
+
+def build_id_indexes():
+    """ Build every registered index now, e.g. from AppConfig.ready(), so the first requests don't pay for it """
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        index.build()
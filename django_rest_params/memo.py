@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+SETTINGS = getattr(settings, 'DJANGO_REST_PARAMS', {})
+MEMOIZE_SIZE = SETTINGS.get('MEMOIZE_SIZE', 1024)  # default max entries for _memoize=True
+MEMOIZE_MAX_VALUE_LENGTH = SETTINGS.get('MEMOIZE_MAX_VALUE_LENGTH', 256)  # requests with longer raw string values aren't memoized
+
+
+class LRUCache(object):
+
+    """ Small thread-safe LRU cache that keeps track of its hit rate """
+
+    def __init__(self, max_size=MEMOIZE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """ Return the value for key, or None. Raises TypeError if key isn't hashable """
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries[key] = value  # move to the end (most recently used)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """ Dict of hits, misses, hit_rate, size, and max_size """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+            }
@@ -0,0 +1,157 @@
+import hashlib
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+
+SETTINGS = getattr(settings, 'DJANGO_REST_PARAMS', {})
+MODEL_CACHE = SETTINGS.get('MODEL_CACHE', 'default')  # alias of the Django cache backend to use for __cache
+MODEL_CACHE_TIMEOUT = SETTINGS.get('MODEL_CACHE_TIMEOUT', 300)  # seconds before an entry gets refreshed
+MODEL_CACHE_STALE_TIMEOUT = SETTINGS.get('MODEL_CACHE_STALE_TIMEOUT', 60)  # how long an expired entry is served while one worker refreshes it
+MODEL_CACHE_LOCK_WAIT = SETTINGS.get('MODEL_CACHE_LOCK_WAIT', 0.05)  # how long to wait for another worker to fill a missing entry
+
+KEY_PREFIX = 'django_rest_params'
+
+
+def _model_label(model):
+    return '%s.%s' % (model.__module__, model.__name__)
+
+
+def _version_key(model):
+    return '%s:version:%s' % (KEY_PREFIX, _model_label(model))
+
+
+_connected_models = set()
+_connected_models_lock = threading.Lock()
+
+
+def _connect_signals(model):
+    """ Bump the model's cache version on every save/delete (once per model, no matter how many ModelCaches use it) """
+    with _connected_models_lock:
+        if model in _connected_models:
+            return
+        _connected_models.add(model)
+
+    def bump_versions():
+        for alias in set(c.cache_alias for c in _model_caches if c.model is model):
+            _bump_version(caches[alias], model)
+
+    def invalidate(sender, **kwargs):
+        bump_versions()
+        # the signals fire before the transaction commits, and until it does other workers can cache the old row under the new version,
+        # so bump it again once it's committed (on Django 1.9+; on_commit runs it right away if we're not in a transaction)
+        on_commit = getattr(transaction, 'on_commit', None)
+        if on_commit:
+            on_commit(bump_versions, using=router.db_for_write(model))
+
+    post_save.connect(invalidate, sender=model, weak=False)
+    post_delete.connect(invalidate, sender=model, weak=False)
+
+
+def _bump_version(cache, model):
+    key = _version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:  # no version yet (or it was evicted), so start a new one
+        cache.set(key, _new_version(), None)
+
+
+def _new_version():
+    # start from a random version instead of 0, so that an evicted version key can't bring old entries back
+    return random.randint(1, 2 ** 30) * 1000
+
+
+_model_caches = []
+
+
+class ModelCache(object):
+
+    """
+        Caches model param lookups in a Django cache backend so every worker process can share them.
+
+        Only the fields we fetched (just 'id' for deferred params) are stored, and instances are rebuilt with Model.from_db(),
+        so a cache hit gives you the same thing as the query would have.
+
+        Every entry is tagged with the model's version, which is stored in the cache too and bumped by post_save/post_delete;
+        entries with an old version are ignored. Expired entries are kept around for MODEL_CACHE_STALE_TIMEOUT seconds so
+        that only one worker refreshes a hot entry while the others keep using the old one, and when an entry is missing
+        entirely the other workers wait (up to MODEL_CACHE_LOCK_WAIT seconds) for the one that's fetching it.
+    """
+
+    def __init__(self, model, field='id', deferred=True, cache_alias=MODEL_CACHE, timeout=MODEL_CACHE_TIMEOUT):
+        self.model = model
+        self.field = field
+        self.deferred = deferred
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        _model_caches.append(self)
+        _connect_signals(model)
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _key(self, value):
+        digest = hashlib.md5(('%s' % value).encode('utf-8')).hexdigest()
+        return '%s:%s:%s:%s:%s' % (KEY_PREFIX, _model_label(self.model), self.field, 'd' if self.deferred else 'f', digest)
+
+    def _version(self, cache, versions):
+        key = _version_key(self.model)
+        version = versions.get(key)
+        if version is None:
+            cache.add(key, _new_version(), None)
+            version = cache.get(key)
+        return version
+
+    def _serialize(self, instance):
+        if self.deferred:
+            field_names = ('id',)
+        else:
+            field_names = tuple(f.attname for f in self.model._meta.concrete_fields)
+        return field_names, tuple(getattr(instance, name) for name in field_names)
+
+    def _deserialize(self, field_names, values):
+        return self.model.from_db(router.db_for_read(self.model), field_names, values)
+
+    def _fetch_and_store(self, cache, key, version, fetch):
+        instance = fetch()
+        field_names, values = self._serialize(instance)
+        cache.set(key, (version, time.time() + self.timeout, field_names, values), self.timeout + MODEL_CACHE_STALE_TIMEOUT)
+        return instance
+
+    def get(self, value, fetch):
+        """ Return the cached instance for value, or call fetch() to get it (and cache it) """
+        cache = self.cache
+        key = self._key(value)
+        lock_key = key + ':lock'
+        found = cache.get_many([key, _version_key(self.model)])
+        version = self._version(cache, found)
+        entry = found.get(key)
+
+        if entry and entry[0] == version:
+            _, expires, field_names, values = entry
+            if expires > time.time() or not cache.add(lock_key, 1, MODEL_CACHE_STALE_TIMEOUT):
+                # still fresh, or someone else is already refreshing it
+                return self._deserialize(field_names, values)
+            try:
+                return self._fetch_and_store(cache, key, version, fetch)
+            finally:
+                cache.delete(lock_key)
+
+        if not cache.add(lock_key, 1, MODEL_CACHE_STALE_TIMEOUT):
+            # someone else is fetching it. Give them a moment, then just do the query ourselves
+            deadline = time.time() + MODEL_CACHE_LOCK_WAIT
+            while time.time() < deadline:
+                time.sleep(MODEL_CACHE_LOCK_WAIT / 10.0)
+                entry = cache.get(key)
+                if entry and entry[0] == version:
+                    return self._deserialize(entry[2], entry[3])
+            return fetch()
+        try:
+            return self._fetch_and_store(cache, key, version, fetch)
+        finally:
+            cache.delete(lock_key)
@@ -0,0 +1,39 @@
+from operator import itemgetter
+
+
+class ValidatedParams(tuple):
+
+    """
+        Base class for the params objects passed to views with _as_object. Subclasses made by make_params_class() have a read-only
+        attribute for each param; the last item of the tuple is a bitmask of which params were supplied in the request.
+    """
+
+    __slots__ = ()
+    _fields = ()
+    _bits = {}
+
+    def _supplied(self, name):
+        """ True if param name was in the request, False if it got its default value """
+        return bool(self[-1] & self._bits[name])
+
+    def _defaulted(self, name):
+        """ True if param name wasn't in the request and got its default value """
+        return not self[-1] & self._bits[name]
+
+    def _asdict(self):
+        return dict(zip(self._fields, self))
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join('%s=%r' % item for item in zip(self._fields, self)))
+
+
+def make_params_class(arg_names, class_name='Params'):
+    """ Make a ValidatedParams subclass for a set of params, e.g. make_params_class(('user', 'offset')) """
+    namespace = {
+        '__slots__': (),
+        '_fields': tuple(arg_names),
+        '_bits': dict((name, 1 << i) for i, name in enumerate(arg_names)),
+    }
+    for i, name in enumerate(arg_names):
+        namespace[name] = property(itemgetter(i))
+    return type(class_name, (ValidatedParams,), namespace)
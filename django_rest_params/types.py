@@ -0,0 +1,187 @@
+import datetime
+import sys
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.utils import dateparse, timezone
+
+SETTINGS = getattr(settings, 'DJANGO_REST_PARAMS', {})
+TRUE_VALUES = SETTINGS.get('TRUE_VALUES', ('1', 'true'))
+FALSE_VALUES = SETTINGS.get('FALSE_VALUES', ('0', 'false'))
+INT_MAX_DIGITS = SETTINGS.get('INT_MAX_DIGITS', 4300)  # max digits for int params without both upper and lower bounds (same as CPython 3.11's default limit)
+
+if (sys.version_info > (3, 0)):
+    text_type = str
+    string_types = (str,)
+else:
+    text_type = unicode
+    string_types = (str, unicode)
+
+
+class ParamType(object):
+
+    """
+        How to handle params of a given type:
+          converter - fn that takes the raw value from the request and returns the converted value, or raises an Exception
+          compare   - fn that takes the converted value and returns what gt/gte/lt/lte/eq are checked against (e.g. len for str),
+                      or None if range checks don't make sense for this type
+          max_raw_length - fn that takes the (lower, upper) bounds of a param (either may be None) and returns the longest raw string
+                           that could possibly be valid, or None for no limit. Longer values are rejected before they're converted.
+          converted_type - type of the converted values, if it isn't the param type itself (fn.call() doesn't convert values that already have it)
+          memoizable     - False if converting a value depends on more than the raw value (e.g. time or the DB), so _memoize can't cache it
+    """
+
+    def __init__(self, converter, compare=None, max_raw_length=None, converted_type=None, memoizable=True):
+        self.converter = converter
+        self.compare = compare
+        self.max_raw_length = max_raw_length
+        self.converted_type = converted_type
+        self.memoizable = memoizable
+
+
+_registry = {}
+
+
+def register_type(param_type, converter, compare=None, max_raw_length=None):
+    """
+        Register a converter for a param type, e.g.
+
+            register_type(IPv4Address, ipaddress.IPv4Address, compare=lambda ip: ip, max_raw_length=lambda lower, upper: 15)
+
+        After that, @params(ip=IPv4Address, ip__gte=...) works like any of the built-in types.
+        Param types can also be objects with an as_param_type() method that returns a ParamType, like Cursor('-created', 'id').
+    """
+    _registry[param_type] = ParamType(converter, compare, max_raw_length)
+
+
+def get_type(param_type):
+    """ Return the ParamType registered for param_type (or made by its as_param_type()), or None """
+    try:
+        registered_type = _registry.get(param_type)
+    except TypeError:  # unhashable, e.g. a list of options
+        return None
+    if registered_type is None and not isinstance(param_type, type) and hasattr(param_type, 'as_param_type'):
+        return param_type.as_param_type()
+    return registered_type
+
+
+def _identity(val):
+    return val
+
+
+def _fixed_length(length):
+    return lambda lower, upper: length
+
+
+def _int_max_raw_length(lower, upper):
+    # if it's bounded on both sides, nothing valid can have more digits than the bounds (plus a sign and some whitespace)
+    if lower is not None and upper is not None:
+        return max(len('%d' % int(bound)) for bound in (lower, upper)) + 2
+    return INT_MAX_DIGITS + 2
+
+
+def _number_max_raw_length(lower, upper):
+    # leave room for a decimal point and plenty of decimal places
+    if lower is not None and upper is not None:
+        return max(len('%d' % int(bound)) for bound in (lower, upper)) + 32
+    return None
+
+
+def _str_max_raw_length(lower, upper):
+    return int(upper) if upper is not None else None
+
+
+def _bool_max_raw_length(lower, upper):
+    return max(len(v) for v in TRUE_VALUES + FALSE_VALUES)
+
+
+def _to_str(param):
+    if not isinstance(param, string_types):
+        raise Exception('must be a string')
+    return text_type(param)
+
+
+def _to_bool(param):
+    param = str(param).lower()  # bool isn't case sensitive
+    if param in TRUE_VALUES:
+        return True
+    elif param in FALSE_VALUES:
+        return False
+    raise Exception('%s is not a valid bool: must be one of: %s' % (param, TRUE_VALUES + FALSE_VALUES))
+
+
+def _to_decimal(param):
+    try:
+        param = Decimal(param if isinstance(param, string_types) else str(param))
+    except InvalidOperation:
+        raise Exception('%s is not a valid decimal' % param)
+    if not param.is_finite():
+        raise Exception('%s is not a valid decimal' % param)
+    return param
+
+
+def _to_uuid(param):
+    if isinstance(param, uuid.UUID):
+        return param
+    return uuid.UUID(param)
+
+
+# datetime.fromisoformat (3.7+) is much faster than Django's regex-based parsers, so use it when we can
+# and only fall back to dateparse for the formats it doesn't handle (e.g. a 'Z' suffix before 3.11)
+_date_fromisoformat = getattr(datetime.date, 'fromisoformat', None)
+_datetime_fromisoformat = getattr(datetime.datetime, 'fromisoformat', None)
+_time_fromisoformat = getattr(datetime.time, 'fromisoformat', None)
+
+
+def _make_parser(fromisoformat, fallback, name):
+    def parse(param):
+        if not isinstance(param, string_types):
+            raise Exception('%s is not a valid %s' % (param, name))
+        if fromisoformat:
+            try:
+                return fromisoformat(param)
+            except ValueError:
+                pass
+        try:
+            value = fallback(param)
+        except ValueError:
+            value = None
+        if value is None:
+            raise Exception('%s is not a valid %s' % (param, name))
+        return value
+    return parse
+
+
+_parse_date = _make_parser(_date_fromisoformat, dateparse.parse_date, 'date')
+_parse_datetime = _make_parser(_datetime_fromisoformat, dateparse.parse_datetime, 'datetime')
+_parse_time = _make_parser(_time_fromisoformat, dateparse.parse_time, 'time')
+
+
+def normalize_datetime(value):
+    """
+        Make a datetime aware in the default time zone if USE_TZ is on, or naive (in the default time zone) if it's off,
+        so parsed values can be compared with each other and with the bounds passed to @params
+    """
+    if settings.USE_TZ and timezone.is_naive(value):
+        return timezone.make_aware(value, timezone.get_default_timezone())
+    if not settings.USE_TZ and timezone.is_aware(value):
+        return timezone.make_naive(value, timezone.get_default_timezone())
+    return value
+
+
+def _to_datetime(param):
+    return normalize_datetime(_parse_datetime(param))
+
+
+register_type(int, int, compare=_identity, max_raw_length=_int_max_raw_length)
+register_type(float, float, compare=_identity, max_raw_length=_number_max_raw_length)
+register_type(str, _to_str, compare=len, max_raw_length=_str_max_raw_length)
+if text_type is not str:
+    register_type(text_type, _to_str, compare=len, max_raw_length=_str_max_raw_length)
+register_type(bool, _to_bool, max_raw_length=_bool_max_raw_length)
+register_type(Decimal, _to_decimal, compare=_identity, max_raw_length=_number_max_raw_length)
+register_type(datetime.date, _parse_date, compare=_identity, max_raw_length=_fixed_length(64))
+register_type(datetime.datetime, _to_datetime, compare=_identity, max_raw_length=_fixed_length(64))
+register_type(datetime.time, _parse_time, compare=_identity, max_raw_length=_fixed_length(64))
+register_type(uuid.UUID, _to_uuid, max_raw_length=_fixed_length(64))
@@ -0,0 +1,97 @@
+"""
+Benchmark for _concurrent: looking up several model params one at a time vs. at the same time on the shared thread pool.
+
+Uses the example project with a SQLite backend that sleeps before every query and every new connection (example.delayed_sqlite),
+to stand in for a remote DB. For each delay, times a view with three model params with and without _concurrent, checks that both give
+the same responses, and counts the new DB connections made while timing (with the pool's connections reused, there shouldn't be any).
+
+    python -m example.bench_concurrent --delays 0 0.001 0.005 0.02
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'example.settings')
+os.environ.setdefault('EXAMPLE_DB_ENGINE', 'example.delayed_sqlite')
+
+
+class FakeRequest(object):
+
+    """ Just enough of a DRF request for @params """
+
+    def __init__(self, get):
+        self.GET = get
+        self.DATA = {}
+        self.META = {'REQUEST_METHOD': 'GET'}
+
+
+def time_per_request(view, requests):
+    start = time.time()
+    responses = [view(request) for request in requests]
+    return (time.time() - start) / len(requests), responses
+
+
+def out_line(out, *args):
+    out.write('%-10s %16s %16s %9s %10s %9s\n' % args)
+    out.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--delays', type=float, nargs='+', default=[0, 0.001, 0.005, 0.02], help='seconds to sleep before each query')
+    parser.add_argument('--connect-delay-factor', type=float, default=3,
+                        help='connecting takes this many times the query delay (TCP + TLS + auth round trips)')
+    parser.add_argument('--requests', type=int, default=100, help='number of requests to time for each delay')
+    parser.add_argument('--invalid-ratio', type=float, default=0.2, help='fraction of requests with an author that does not exist')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+    from django_rest_params.decorators import params
+    from example.loadtest import setup_db
+    from example.models import Author, Book
+
+    num_authors, num_books = 200, 5000
+    book_authors = setup_db(num_authors, num_books, args.seed)
+
+    def make_view(concurrent):
+        @params(_concurrent=concurrent, book=Book, author=Author, author__field='name', related=Book, related__optional=True)
+        def compare_books(request, book, author, related):
+            return (book.id, author.id, related and related.id)
+        return compare_books
+
+    sequential_view, concurrent_view = make_view(False), make_view(True)
+
+    rng = random.Random(args.seed)
+    requests = []
+    for _ in range(args.requests):
+        book_id = rng.randint(1, num_books)
+        author = 'Author %d' % (book_authors[book_id] if rng.random() >= args.invalid_ratio else num_authors + 1)
+        requests.append(FakeRequest({'book': str(book_id), 'author': author, 'related': str(rng.randint(1, num_books))}))
+
+    connects = []
+    connection_created.connect(lambda sender, connection, **kwargs: connects.append(connection), weak=False)
+
+    out = sys.stdout
+    out_line(out, 'delay (ms)', 'sequential (ms)', 'concurrent (ms)', 'speedup', 'same', 'connects')
+    for delay in args.delays:
+        settings.DATABASES['default']['QUERY_DELAY'] = delay
+        settings.DATABASES['default']['CONNECT_DELAY'] = delay * args.connect_delay_factor
+        connection.close()
+        sequential_view(requests[0]), concurrent_view(requests[0])  # warm up the thread pool and connections
+        del connects[:]
+        sequential, sequential_responses = time_per_request(sequential_view, requests)
+        concurrent, concurrent_responses = time_per_request(concurrent_view, requests)
+        same = [getattr(r, 'data', r) for r in sequential_responses] == [getattr(r, 'data', r) for r in concurrent_responses]
+        out_line(out, '%g' % (delay * 1000), '%.2f' % (sequential * 1000), '%.2f' % (concurrent * 1000),
+                 '%.2fx' % (sequential / concurrent), 'yes' if same else 'NO', len(connects))
+
+
+if __name__ == '__main__':
+    main()
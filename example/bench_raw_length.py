@@ -0,0 +1,85 @@
+"""
+Benchmark for rejecting pathological inputs (huge digit strings, giant strs, __many params with lots of values).
+
+For each input size, times how long @params takes to reject the request, next to how long just converting the raw value takes
+(which is what we used to do before checking its length). The @params times should stay flat as the inputs grow.
+
+    python -m example.bench_raw_length
+"""
+import argparse
+import os
+import sys
+import timeit
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'example.settings')
+
+
+class FakeRequest(object):
+
+    """ Just enough of a DRF request for @params """
+
+    def __init__(self, get):
+        self.GET = get
+        self.DATA = {}
+        self.META = {'REQUEST_METHOD': 'GET'}
+
+
+def time_per_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number
+
+
+def out_line(out, *args):
+    out.write('%-20s %10s %9s %16s %16s\n' % args)
+    out.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--max-size', type=int, default=10 ** 5, help='largest input size, in characters')
+    args = parser.parse_args(argv)
+
+    import django
+    django.setup()
+    from django_rest_params.decorators import params
+
+    @params(page=int, page__gte=1, page__lte=10000)
+    def bounded_int_view(request, page):
+        pass
+
+    @params(page=int)
+    def unbounded_int_view(request, page):
+        pass
+
+    @params(q=str, q__length__lte=100)
+    def str_view(request, q):
+        pass
+
+    @params(ids=int, ids__many=True, ids__gte=1, ids__lte=1000)
+    def many_view(request, ids):
+        pass
+
+    out = sys.stdout
+    out_line(out, 'input', 'size', 'rejected', '@params (us)', 'convert (us)')
+    size = 100
+    while size <= args.max_size:
+        digits = '9' * size
+        text = u'x' * size
+        csv = ','.join(['1'] * (size // 2))
+        number = max(1, 10000 // size)
+        cases = (
+            ('int, gte/lte', bounded_int_view, {'page': digits}, lambda: int(digits)),
+            ('int, no bounds', unbounded_int_view, {'page': digits}, lambda: int(digits)),
+            ('str, length__lte', str_view, {'q': text}, lambda: len(u'%s' % text)),
+            ('int, __many', many_view, {'ids': csv}, lambda: [int(p) for p in csv.split(',')]),
+        )
+        for name, view, get, convert in cases:
+            request = FakeRequest(get)
+            rejected = view(request) is not None  # the views return None, so anything else is a 400
+            out_line(out, name, size, 'yes' if rejected else 'no',
+                     '%.2f' % (time_per_call(lambda: view(request), 1000) * 1e6),
+                     '%.2f' % (time_per_call(convert, number) * 1e6))
+        size *= 10
+
+
+if __name__ == '__main__':
+    main()
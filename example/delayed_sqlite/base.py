@@ -0,0 +1,34 @@
+"""
+SQLite backend that sleeps for DATABASES[alias]['QUERY_DELAY'] seconds before every query, and for ['CONNECT_DELAY'] seconds
+(QUERY_DELAY if not set) before connecting, to stand in for a remote DB
+in benchmarks (python -m example.bench_concurrent).
+"""
+import time
+
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper, SQLiteCursorWrapper
+
+
+class DelayedCursorWrapper(SQLiteCursorWrapper):
+
+    delay = 0
+
+    def execute(self, query, params=None):
+        time.sleep(self.delay)
+        return super(DelayedCursorWrapper, self).execute(query, params)
+
+    def executemany(self, query, param_list):
+        time.sleep(self.delay)
+        return super(DelayedCursorWrapper, self).executemany(query, param_list)
+
+
+class DatabaseWrapper(SQLiteDatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        # connecting to a remote DB takes at least a round trip (usually several, plus TLS/auth), so don't make it free
+        time.sleep(self.settings_dict.get('CONNECT_DELAY', self.settings_dict.get('QUERY_DELAY', 0)))
+        return super(DatabaseWrapper, self).get_new_connection(conn_params)
+
+    def create_cursor(self, *args, **kwargs):
+        cursor = self.connection.cursor(factory=DelayedCursorWrapper)
+        cursor.delay = self.settings_dict.get('QUERY_DELAY', 0)  # read per cursor so it can be changed after the DB is set up
+        return cursor
@@ -0,0 +1,292 @@
+"""
+In-process load test for @params.
+
+Sends a mix of valid and invalid requests to the example project's views through Django's WSGI handler (no network, no server)
+and reports throughput and p50/p95/p99 latencies, both for the whole request and for just the time spent in @params.
+
+    python -m example.loadtest --requests 20000 --invalid-ratio 0.2
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from decimal import Decimal
+from io import BytesIO
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'example.settings')
+
+
+def setup_db(num_authors, num_books, seed):
+    """ Create a fresh DB with num_authors Authors and num_books Books. Returns a dict of book ID -> author ID """
+    from django.conf import settings
+    from django.db import connection
+    from django.utils import timezone
+    from example.models import Author, Book
+
+    db_name = settings.DATABASES['default']['NAME']
+    connection.close()
+    if os.path.exists(db_name):
+        os.remove(db_name)
+    with connection.schema_editor() as editor:
+        editor.create_model(Author)
+        editor.create_model(Book)
+
+    rng = random.Random(seed)
+    book_authors = dict((i, rng.randint(1, num_authors)) for i in range(1, num_books + 1))
+    Author.objects.bulk_create([Author(id=i, name='Author %d' % i) for i in range(1, num_authors + 1)])
+    now = timezone.now()
+    Book.objects.bulk_create([Book(id=i,
+                                   title='Book %d' % i,
+                                   author_id=book_authors[i],
+                                   published=datetime.date(2000, 1, 1) + datetime.timedelta(days=rng.randint(0, 5000)),
+                                   price=Decimal(rng.randint(100, 10000)) / 100,
+                                   created=now - datetime.timedelta(seconds=i))
+                              for i in range(1, num_books + 1)], batch_size=500)
+    return book_authors
+
+
+class TrafficGenerator(object):
+
+    """ Generates (label, method, path, params, valid) for a realistic mix of requests, some fraction of them invalid """
+
+    def __init__(self, num_authors, book_authors, invalid_ratio, seed):
+        self.num_authors = num_authors
+        self.num_books = len(book_authors)
+        self.book_authors = book_authors
+        self.invalid_ratio = invalid_ratio
+        self.rng = random.Random(seed)
+        self.cursors = [None]
+        # (weight, valid request fn, invalid request fn)
+        self.endpoints = [
+            (30, self.list_books, self.list_books_invalid),
+            (15, self.get_books, self.get_books_invalid),
+            (15, self.search_books, self.search_books_invalid),
+            (10, self.create_book, self.create_book_invalid),
+            (20, self.feed, self.feed_invalid),
+            (10, self.feed_retrieve, self.feed_retrieve_invalid),
+        ]
+        self.total_weight = sum(e[0] for e in self.endpoints)
+
+    def next_request(self):
+        n = self.rng.uniform(0, self.total_weight)
+        for weight, valid_fn, invalid_fn in self.endpoints:
+            n -= weight
+            if n <= 0:
+                break
+        valid = self.rng.random() >= self.invalid_ratio
+        return (valid_fn if valid else invalid_fn)() + (valid,)
+
+    def author_id(self):
+        return self.rng.randint(1, self.num_authors)
+
+    def book_id(self):
+        return self.rng.randint(1, self.num_books)
+
+    def list_books(self):
+        query = {'limit': self.rng.choice((10, 20, 50))}
+        if self.rng.random() < 0.5:
+            query['author_id'] = self.author_id()
+        if self.rng.random() < 0.3:
+            query['published_after'] = '2005-%02d-01' % self.rng.randint(1, 12)
+        if self.rng.random() < 0.3:
+            query['max_price'] = '%d.99' % self.rng.randint(1, 99)
+        if self.rng.random() < 0.3:
+            query['sort'] = self.rng.choice(('title', 'published', 'price'))
+            query['offset'] = self.rng.randint(0, 200)
+        return 'list_books', 'GET', '/books/', query
+
+    def list_books_invalid(self):
+        query = self.rng.choice(({'limit': 1000}, {'limit': 'ten'}, {'author_id': self.num_authors + 1000 + self.author_id()},
+                                 {'published_after': 'last tuesday'}, {'max_price': '-5'}, {'sort': 'popularity'}, {'offset': -1}))
+        return 'list_books', 'GET', '/books/', query
+
+    def get_books(self):
+        return 'get_books', 'GET', '/books/by_id/', {'ids': ','.join(str(self.book_id()) for _ in range(self.rng.randint(1, 10))),
+                                                     'fields': 'title,price'}
+
+    def get_books_invalid(self):
+        return 'get_books', 'GET', '/books/by_id/', self.rng.choice(({}, {'ids': '1,2,x'}, {'ids': '0'}, {'ids': '1', 'fields': 'isbn'}))
+
+    def search_books(self):
+        return 'search_books', 'GET', '/books/search/', {'q': 'Book %d' % self.rng.randint(1, 99), 'exact': self.rng.choice(('true', 'false'))}
+
+    def search_books_invalid(self):
+        return 'search_books', 'GET', '/books/search/', self.rng.choice(({'q': 'B'}, {'q': 'B' * 100}, {'q': 'Book', 'exact': 'maybe'}))
+
+    def create_book(self):
+        return 'create_book', 'POST', '/books/create/', {'title': 'New Book', 'author_id': self.author_id(),
+                                                         'price': '%d.%02d' % (self.rng.randint(1, 99), self.rng.randint(0, 99)),
+                                                         'published': '2015-06-01'}
+
+    def create_book_invalid(self):
+        body = {'title': 'New Book', 'author_id': self.author_id(), 'price': '9.99', 'published': '2015-06-01'}
+        key, value = self.rng.choice((('title', ''), ('author_id', -1), ('price', 'free'), ('published', '2015-02-30'), ('price', None)))
+        if value is None:
+            del body[key]
+        else:
+            body[key] = value
+        return 'create_book', 'POST', '/books/create/', body
+
+    def feed(self):
+        query = {'limit': self.rng.choice((10, 20))}
+        cursor = self.rng.choice(self.cursors)
+        if cursor:
+            query['after'] = cursor
+        return 'feed', 'GET', '/feed/', query
+
+    def feed_invalid(self):
+        cursor = self.rng.choice(self.cursors[1:] or ['x'])
+        return 'feed', 'GET', '/feed/', self.rng.choice(({'after': cursor[:-2] + 'xx'}, {'after': 'not-a-cursor'}, {'limit': 0}))
+
+    def feed_retrieve(self):
+        book_id = self.book_id()
+        return 'feed_retrieve', 'GET', '/feed/%d/' % book_id, {'author': self.book_authors[book_id], 'include_books': 'false'}
+
+    def feed_retrieve_invalid(self):
+        return 'feed_retrieve', 'GET', '/feed/%d/' % self.book_id(), self.rng.choice(({}, {'author': 'me'}, {'author': 1, 'include_books': 'yes'}))
+
+    def saw_response(self, label, body):
+        """ Remember next-page cursors so later feed requests can use them """
+        if label == 'feed' and body.get('next') and len(self.cursors) < 1000:
+            self.cursors.append(body['next'])
+
+
+def make_environ(method, path, params):
+    body = b''
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if method == 'GET':
+        environ['QUERY_STRING'] = urlencode(params)
+    else:
+        body = json.dumps(params).encode('utf-8')
+        environ['CONTENT_TYPE'] = 'application/json'
+    environ['CONTENT_LENGTH'] = str(len(body))
+    environ['wsgi.input'] = BytesIO(body)
+    return environ
+
+
+def percentile(sorted_values, p):
+    """ Nearest-rank percentile of an already-sorted list """
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[max(int(math.ceil(p / 100.0 * len(sorted_values))) - 1, 0)]
+
+
+def run(handler, traffic, num_requests, results=None):
+    statuses = {}
+
+    def start_response(status, headers, exc_info=None):
+        statuses['status'] = int(status.split(' ', 1)[0])
+
+    from example.timing import pop_decorator_time
+
+    for _ in range(num_requests):
+        label, method, path, params, valid = traffic.next_request()
+        environ = make_environ(method, path, params)
+        start = time.time()
+        response = handler(environ, start_response)
+        body = b''.join(response)
+        if hasattr(response, 'close'):
+            response.close()
+        total_time = time.time() - start
+        decorator_time = pop_decorator_time()
+
+        status = statuses['status']
+        if status == 200:
+            traffic.saw_response(label, json.loads(body.decode('utf-8')))
+        if results is not None:
+            results.append((label, valid, status, total_time, decorator_time))
+
+
+def report(results, elapsed, out=sys.stdout):
+    def line(name, rows):
+        totals = sorted(r[3] for r in rows)
+        decorator_times = sorted(r[4] for r in rows if r[4] is not None)
+        ms = lambda values, p: percentile(values, p) * 1000
+        out.write('%-22s %7d  %7.3f %7.3f %7.3f   %7.3f %7.3f %7.3f\n' % (
+            name, len(rows),
+            ms(decorator_times, 50), ms(decorator_times, 95), ms(decorator_times, 99),
+            ms(totals, 50), ms(totals, 95), ms(totals, 99)))
+
+    out.write('%d requests in %.2fs: %.1f requests/s\n\n' % (len(results), elapsed, len(results) / elapsed))
+    out.write('%-22s %7s  %-23s   %-23s\n' % ('', '', '@params (ms)', 'total (ms)'))
+    out.write('%-22s %7s  %7s %7s %7s   %7s %7s %7s\n' % ('endpoint', 'count', 'p50', 'p95', 'p99', 'p50', 'p95', 'p99'))
+    by_endpoint = defaultdict(list)
+    for r in results:
+        by_endpoint[(r[0], r[1])].append(r)
+    for (label, valid), rows in sorted(by_endpoint.items()):
+        line('%s (%s)' % (label, 'valid' if valid else 'invalid'), rows)
+    line('all', results)
+
+    by_status = defaultdict(int)
+    for r in results:
+        by_status[r[2]] += 1
+    out.write('\nstatus codes: %s\n' % ', '.join('%d: %d' % item for item in sorted(by_status.items())))
+
+    # valid requests should succeed and invalid ones should get a 400 from @params; anything else (especially a 500) is a failure
+    failures = (
+        ('got a 5xx', [r for r in results if r[2] >= 500]),
+        ('got an unexpected status code', [r for r in results if r[2] < 500 and (r[2] < 400 if r[1] else r[2] == 400) is False]),
+        ('have no @params time', [r for r in results if r[4] is None]),
+    )
+    num_failures = 0
+    for description, rows in failures:
+        if rows:
+            counts = defaultdict(int)
+            for r in rows:
+                counts['%s (%s)' % (r[0], 'valid' if r[1] else 'invalid')] += 1
+            out.write('FAILED: %d requests %s: %s\n' % (len(rows), description, ', '.join('%s: %d' % item for item in sorted(counts.items()))))
+            num_failures += len(rows)
+    return num_failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--requests', type=int, default=10000, help='number of requests to time')
+    parser.add_argument('--warmup', type=int, default=500, help='number of untimed requests to send first')
+    parser.add_argument('--invalid-ratio', type=float, default=0.2, help='fraction of requests that should fail validation')
+    parser.add_argument('--authors', type=int, default=200)
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    import django
+    django.setup()
+    from django.core.handlers.wsgi import WSGIHandler
+
+    book_authors = setup_db(args.authors, args.books, args.seed)
+    handler = WSGIHandler()
+    traffic = TrafficGenerator(args.authors, book_authors, args.invalid_ratio, args.seed)
+
+    run(handler, traffic, args.warmup)
+    results = []
+    start = time.time()
+    run(handler, traffic, args.requests, results)
+    return 1 if report(results, time.time() - start) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
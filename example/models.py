@@ -0,0 +1,20 @@
+from django.db import models
+
+
+class Author(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        app_label = 'example'
+
+
+class Book(models.Model):
+    title = models.CharField(max_length=200)
+    author = models.ForeignKey(Author, related_name='books', on_delete=models.CASCADE)
+    published = models.DateField()
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    created = models.DateTimeField(db_index=True)
+
+    class Meta:
+        app_label = 'example'
+        index_together = [('created', 'id')]
@@ -0,0 +1,49 @@
+"""
+Settings for the example project used by the load test (python -m example.loadtest).
+Everything runs in-process against a throwaway SQLite DB, so there's nothing to set up.
+"""
+import os
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SECRET_KEY = 'django-rest-params-example'
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+INSTALLED_APPS = [
+    'django.contrib.contenttypes',
+    'rest_framework',
+    'django_rest_params',
+    'example',
+]
+
+MIDDLEWARE_CLASSES = []
+MIDDLEWARE = []
+
+ROOT_URLCONF = 'example.urls'
+
+DATABASES = {
+    'default': {
+        'ENGINE': os.environ.get('EXAMPLE_DB_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': os.environ.get('EXAMPLE_DB', os.path.join(tempfile.gettempdir(), 'django_rest_params_example.sqlite3')),
+        'QUERY_DELAY': 0,  # seconds, for ENGINE='example.delayed_sqlite'
+    }
+}
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+USE_TZ = True
+TIME_ZONE = 'UTC'
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': [],
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_PARSER_CLASSES': ['rest_framework.parsers.JSONParser', 'rest_framework.parsers.FormParser'],
+    'UNAUTHENTICATED_USER': None,
+}
+
+DJANGO_REST_PARAMS = {}
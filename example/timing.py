@@ -0,0 +1,35 @@
+"""
+Timing hooks for the load test.
+
+@timed goes on the outside of @params and records when the request reached the decorator; mark_view_start() is called first thing
+in the view body. The difference is the time spent in @params. If the view never ran (e.g. @params returned a 400), the decorator
+time is all the time spent inside @timed.
+"""
+import threading
+import time
+from functools import wraps
+
+_local = threading.local()
+
+
+def timed(fn):
+    @wraps(fn)
+    def timed_fn(*args, **kwargs):
+        _local.view_start = None
+        start = time.time()
+        response = fn(*args, **kwargs)
+        end = time.time()
+        _local.decorator_time = ((_local.view_start or end) - start)
+        return response
+    return timed_fn
+
+
+def mark_view_start():
+    _local.view_start = time.time()
+
+
+def pop_decorator_time():
+    """ Return the decorator time of the last request on this thread (or None if it didn't go through @timed) """
+    decorator_time = getattr(_local, 'decorator_time', None)
+    _local.decorator_time = None
+    return decorator_time
@@ -0,0 +1,15 @@
+from django.conf.urls import include, url
+from rest_framework import routers
+
+from example import views
+
+router = routers.SimpleRouter()
+router.register(r'feed', views.BookFeedViewSet, base_name='feed')
+
+urlpatterns = [
+    url(r'^books/$', views.list_books),
+    url(r'^books/by_id/$', views.get_books),
+    url(r'^books/search/$', views.search_books),
+    url(r'^books/create/$', views.create_book),
+    url(r'^', include(router.urls)),
+]
@@ -0,0 +1,101 @@
+import datetime
+from decimal import Decimal
+
+from rest_framework import status, viewsets
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from django_rest_params.cursors import Cursor
+from django_rest_params.decorators import params
+from example.models import Author, Book
+from example.timing import mark_view_start, timed
+
+PAGE_SIZE = 20
+
+BOOKS_CURSOR = Cursor('-created', 'id')
+
+
+def _book_json(book):
+    return {'id': book.id, 'title': book.title, 'author_id': book.author_id, 'price': str(book.price)}
+
+
+@api_view(['GET'])
+@timed
+@params(author=Author, author__name='author_id', author__optional=True,
+        published_after=datetime.date, published_after__optional=True,
+        max_price=Decimal, max_price__gte=0, max_price__optional=True,
+        sort=('title', 'published', 'price'), sort__default='title',
+        limit=int, limit__gte=1, limit__lte=100, limit__default=PAGE_SIZE,
+        offset=int, offset__gte=0, offset__default=0)
+def list_books(request, author, published_after, max_price, sort, limit, offset):
+    mark_view_start()
+    books = Book.objects.order_by(sort, 'id')
+    if author:
+        books = books.filter(author=author)
+    if published_after:
+        books = books.filter(published__gt=published_after)
+    if max_price is not None:
+        books = books.filter(price__lte=max_price)
+    return Response({'books': [_book_json(b) for b in books[offset:offset + limit]]})
+
+
+@api_view(['GET'])
+@timed
+@params(ids=int, ids__many=True, ids__gte=1,
+        fields=('title', 'price', 'published'), fields__many=True, fields__optional=True)
+def get_books(request, ids, fields):
+    mark_view_start()
+    books = Book.objects.filter(id__in=ids)
+    if fields:
+        books = books.only(*fields)
+    return Response({'count': len(books)})
+
+
+@api_view(['GET'])
+@timed
+@params(q=str, q__length__gte=2, q__length__lte=50,
+        exact=bool, exact__default=False)
+def search_books(request, q, exact):
+    mark_view_start()
+    books = Book.objects.filter(**{'title' if exact else 'title__icontains': q})[:PAGE_SIZE]
+    return Response({'books': [_book_json(b) for b in books]})
+
+
+@api_view(['POST'])
+@timed
+@params(title=str, title__length__gte=1, title__length__lte=200,
+        author=Author, author__name='author_id',
+        price=Decimal, price__gte=0, price__lt=Decimal('10000'),
+        published=datetime.date)
+def create_book(request, title, author, price, published):
+    mark_view_start()
+    # don't actually write anything, so the DB stays the same size for the whole run
+    book = Book(title=title, author=author, price=price, published=published, created=datetime.datetime.now())
+    return Response(_book_json(book), status=status.HTTP_201_CREATED)
+
+
+class BookFeedViewSet(viewsets.ViewSet):
+
+    """ Keyset-paginated feed of books, newest first """
+
+    @timed
+    @params(after=BOOKS_CURSOR, after__optional=True,
+            limit=int, limit__gte=1, limit__lte=100, limit__default=PAGE_SIZE)
+    def list(self, request, after, limit):
+        mark_view_start()
+        books = Book.objects.order_by(*BOOKS_CURSOR.ordering)
+        if after:
+            books = after.filter(books)
+        page = list(books[:limit])
+        return Response({'books': [_book_json(b) for b in page],
+                         'next': BOOKS_CURSOR.encode(page[-1]) if page else None})
+
+    @timed
+    @params(author=Author, author__method='GET',
+            include_books=bool, include_books__default=False)
+    def retrieve(self, request, pk, author, include_books):
+        mark_view_start()
+        book = Book.objects.filter(id=pk, author=author).first()
+        if not book:
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(_book_json(book))
@@ -44,7 +44,11 @@ setup(
 
     keywords='rest,django,api,params,parameters,djangorestframework,decorator',
 
-    packages=find_packages(exclude=['tests']),
+    packages=find_packages(exclude=['tests', 'example', 'example.*']),
 
-    install_requires=['django', 'djangorestframework']
+    install_requires=['django', 'djangorestframework'],
+
+    extras_require={
+        'concurrent': ['futures; python_version < "3"'],  # for _concurrent
+    },
 )
@@ -0,0 +1,34 @@
+"""
+URLconf for test_check_lookup_fields_url_conf: the view below is only ever imported through ROOT_URLCONF, like in a real project
+"""
+from django.conf.urls import url
+
+from django_rest_params.decorators import params
+
+
+class _Field(object):
+    name = attname = 'title'
+    primary_key = unique = db_index = False
+
+
+class _Options(object):
+    pk = None
+    index_together = unique_together = ()
+
+    def get_field(self, name):
+        return _Field()
+
+
+class Book(object):
+    _default_manager = None
+    _meta = _Options()
+
+
+@params(book=Book, book__field='title')
+def get_book_by_title(request, book):
+    pass
+
+
+urlpatterns = [
+    url(r'^books/$', get_book_by_title),
+]
@@ -1,12 +1,37 @@
+import datetime
+import sys
+import tempfile
+import threading
+import time
 import unittest
+import uuid
+from decimal import Decimal
 
 from django.conf import settings
 from rest_framework.response import Response
 
 # Django settings need to be configured before importing the decorator
 if __name__ == '__main__':
-    settings.configure()
+    settings.configure(SECRET_KEY='django-rest-params-tests', CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'file': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.mkdtemp()},
+    })
+    from django.core.cache import caches
+    from django.core.checks.registry import registry
+    from django.db import models, transaction
+    from django.db.models.signals import post_delete, post_save
+    from django.test.utils import override_settings
+    from django.utils import timezone
+    from django_rest_params import concurrency, decorators
     from django_rest_params.decorators import params
+    from django_rest_params.checks import check_lookup_fields
+    from django_rest_params.cursors import Cursor
+    from django_rest_params import id_index
+    from django_rest_params.id_index import BloomFilter, ModelIDIndex, get_id_index
+    from django_rest_params.model_cache import ModelCache
+    from django_rest_params.types import ParamType, register_type
+    from rest_framework.decorators import api_view
+    from rest_framework.test import APIRequestFactory
 
 
 class _MockUserManager(object):
@@ -40,12 +65,32 @@ class _MockUserManager(object):
         """ Just no-op """
         return self
 
+    def values_list(self, field, flat=False):
+        """ Fake .values_list(field, flat=True) """
+        return [getattr(obj, field) for obj in _MockUserManager._objects.values()]
+
+
+class _MockField(object):
+
+    """ Mock model field """
+
+    def __init__(self, attname):
+        self.attname = attname
+
+
+class _MockOptions(object):
+
+    """ Mock Model._meta """
+
+    concrete_fields = [_MockField('id'), _MockField('name'), _MockField('email')]
+
 
 class _MockUser(object):
 
     """ A mock model to test that our Django model integration works correctly """
 
     _default_manager = None  # @params looks for this property to determine if the object if a Django model
+    _meta = _MockOptions()
     objects = _MockUserManager()
 
     name = None
@@ -55,6 +100,13 @@ class _MockUser(object):
         for k, v in kwargs.items():
             setattr(self, k, v)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """ Fake Model.from_db() """
+        obj = cls(**dict(zip(field_names, values)))
+        obj.pk = obj.id
+        return obj
+
 
 class ParamDecoratorTest(unittest.TestCase):
 
@@ -88,6 +140,16 @@ class ParamDecoratorTest(unittest.TestCase):
             self.assertEqual(response.status_code, expected_status_code)
         return response.data
 
+    def count_gets(self):
+        """ Patch _MockUserManager.get to record its calls. Returns the list of calls and a fn to undo the patch """
+        gets = []
+        real_get = _MockUserManager.get
+        _MockUserManager.get = lambda manager, **kwargs: gets.append(kwargs) or real_get(manager, **kwargs)
+
+        def restore():
+            _MockUserManager.get = real_get
+        return gets, restore
+
     def test_int(self):
         """ Test that we can require an 'int' param """
 
@@ -387,6 +449,696 @@ class ParamDecoratorTest(unittest.TestCase):
 
         self.do_fake_request(my_request, get={'user': u'Café'})
 
+    def test_index(self):
+        """ Test that __index rejects IDs that don't exist without querying the DB, and tracks saves/deletes. """
+        @params(user=_MockUser, user__index=True)
+        def my_request(request, user):
+            self.assertTrue(isinstance(user, _MockUser))
+            return Response({'status': 'success'})
+
+        user = _MockUser.objects.create(name='Cam Saul')
+        self.do_fake_request(my_request, get={'user': user.id})
+
+        gets, restore = self.count_gets()
+        try:
+            self.do_fake_request(my_request, expected_status_code=400, get={'user': 0})
+            self.assertEqual(gets, [])
+
+            # new objects get added to the index
+            new_user = _MockUser.objects.create(name='New User')
+            post_save.send(sender=_MockUser, instance=new_user, created=True)
+            self.do_fake_request(my_request, get={'user': str(new_user.id)})
+            self.assertEqual(len(gets), 1)
+        finally:
+            restore()
+
+        # deletes don't remove anything, since they might get rolled back
+        post_delete.send(sender=_MockUser, instance=user)
+        self.do_fake_request(my_request, get={'user': user.id})
+
+        # objects saved without a signal (other processes, bulk_create, raw SQL) with IDs bigger than any when the index was built
+        # still get looked up
+        unsignaled_user = _MockUser.objects.create(name='Unsignaled User')
+        self.do_fake_request(my_request, get={'user': unsignaled_user.id})
+
+        # and the index is rebuilt after ID_INDEX_MAX_AGE, which picks up any others
+        unsignaled_user.id = unsignaled_user.pk = 0
+        _MockUserManager._objects[0] = unsignaled_user
+        try:
+            self.do_fake_request(my_request, expected_status_code=400, get={'user': 0})
+            index = get_id_index(_MockUser)
+            index._built_at -= id_index.ID_INDEX_MAX_AGE + 1
+            self.do_fake_request(my_request, get={'user': 0})
+        finally:
+            del _MockUserManager._objects[0]
+
+        # only valid for models
+        self.assertRaises(Exception, params, my_int=int, my_int__index=True)
+
+    def test_index_concurrent_build(self):
+        """ Test that threads building the same index at the same time all get a working index """
+        index = ModelIDIndex(_MockUser)
+        real_values_list = _MockUserManager.values_list
+        _MockUserManager.values_list = lambda manager, field, flat=False: time.sleep(0.05) or real_values_list(manager, field, flat)
+        errors = []
+
+        def check():
+            try:
+                self.assertTrue(index.might_contain(1))
+            except Exception as e:
+                errors.append(e)
+        try:
+            threads = [threading.Thread(target=check) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            _MockUserManager.values_list = real_values_list
+        self.assertEqual(errors, [])
+
+    def test_index_to_python(self):
+        """ Test that raw values are normalized with the field's to_python() before checking the index """
+        class Manager(object):
+            def __init__(self, values):
+                self.values = values
+
+            def values_list(self, field, flat=False):
+                return self.values
+
+        class Options(object):
+            def __init__(self, field):
+                self.field = field
+
+            def get_field(self, name):
+                return self.field
+
+        int_model = type('IntModel', (object,), {'_meta': Options(models.IntegerField()), 'objects': Manager([7, 8])})
+        index = ModelIDIndex(int_model)
+        self.assertTrue(all(index.might_contain(value) for value in (7, '7', '007', ' 7')))
+        self.assertFalse(index.might_contain('6'))
+        self.assertTrue(index.might_contain('9'))  # bigger than anything at build time, so it might have been saved since
+        self.assertFalse(index.might_contain('seven'))
+
+        value = uuid.uuid4()
+        uuid_model = type('UUIDModel', (object,), {'_meta': Options(models.UUIDField()), 'objects': Manager([value])})
+        index = ModelIDIndex(uuid_model)
+        self.assertTrue(all(index.might_contain(v) for v in (value, str(value), str(value).upper(), value.hex)))
+        self.assertFalse(index.might_contain(str(uuid.uuid4())))
+
+    def test_bloom_filter(self):
+        """ Test that the Bloom filter never gives false negatives, and mostly rejects things it hasn't seen """
+        bloom = BloomFilter(1000, values=range(1000))
+        self.assertTrue(all(str(i) in bloom for i in range(1000)))
+        false_positives = sum(1 for i in range(1000, 11000) if i in bloom)
+        self.assertTrue(false_positives < 300)
+
+    def test_cursor(self):
+        """ Test that Cursor params decode cursors made with .encode(), and reject tampered ones """
+        cursor_type = Cursor('-created', 'id')
+
+        @params(after=cursor_type)
+        def my_request(request, after):
+            self.assertEqual(after.ordering, ('-created', 'id'))
+            return Response({'values': after.values})
+
+        cursor = cursor_type.encode({'created': 100, 'id': 7})
+        self.assertEqual(self.do_fake_request(my_request, get={'after': cursor})['values'], [100, 7])
+
+        # tampered / malformed
+        self.do_fake_request(my_request, expected_status_code=400, get={'after': cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B')})
+        self.do_fake_request(my_request, expected_status_code=400, get={'after': 'not a cursor'})
+        self.do_fake_request(my_request, expected_status_code=400, get={'after': 'A' * 10000})
+
+        # cursors for a different ordering aren't valid
+        self.do_fake_request(my_request, expected_status_code=400, get={'after': Cursor('created', 'id').encode({'created': 100, 'id': 7})})
+
+    def test_cursor_q(self):
+        """ Test the keyset filter for a CursorPosition """
+        position = Cursor('-created', 'id').decode(Cursor('-created', 'id').encode({'created': 100, 'id': 7}))
+        q = position.q()
+        self.assertEqual(q.connector, 'OR')
+        self.assertEqual([[child] if isinstance(child, tuple) else sorted(child.children) for child in q.children],
+                         [[('created__lt', 100)], [('created', 100), ('id__gt', 7)]])
+
+    def test_cursor_types(self):
+        """ Test that cursor values come back with the same type and precision they were encoded with """
+        created = datetime.datetime(2026, 1, 1, 12, 0, 0, 123456)
+        values = {
+            'created': created,
+            'aware': created.replace(tzinfo=timezone.utc),
+            'day': created.date(),
+            'at': created.time(),
+            'price': Decimal('10.10'),
+            'uid': uuid.uuid4(),
+            'id': 7,
+        }
+        cursor_type = Cursor('created', 'aware', 'day', 'at', 'price', 'uid', 'id')
+        position = cursor_type.decode(cursor_type.encode(values))
+        self.assertEqual(position.values, [values[field] for field in cursor_type.ordering])
+        self.assertEqual([type(value) for value in position.values], [type(values[field]) for field in cursor_type.ordering])
+        self.assertEqual(str(position.values[4]), '10.10')
+
+        # the keyset filter uses the exact timestamp, not one rounded to milliseconds
+        q = Cursor('-created', 'id').decode(Cursor('-created', 'id').encode(values)).q()
+        self.assertEqual(q.children[0], ('created__lt', created))
+
+    def test_datetime(self):
+        """ Test date/datetime params, including range checks """
+        @params(since=datetime.datetime, since__gte=datetime.datetime(2015, 1, 1), day=datetime.date, day__optional=True)
+        def my_request(request, since, day):
+            self.assertTrue(isinstance(since, datetime.datetime))
+            return Response({'since': since, 'day': day})
+
+        self.assertEqual(self.do_fake_request(my_request, get={'since': '2015-06-01T12:30:00'})['since'], datetime.datetime(2015, 6, 1, 12, 30))
+        self.assertEqual(self.do_fake_request(my_request, get={'since': '2015-06-01 12:30', 'day': '2015-06-02'})['day'], datetime.date(2015, 6, 2))
+
+        self.do_fake_request(my_request, expected_status_code=400, get={'since': '2014-12-31T23:59:59'})
+        self.do_fake_request(my_request, expected_status_code=400, get={'since': 'yesterday'})
+        self.do_fake_request(my_request, expected_status_code=400, get={'since': '2015-06-01T12:30:00', 'day': '2015-13-01'})
+
+        # bounds and parsed values are both aware with USE_TZ on, even if the bound was naive
+        with override_settings(USE_TZ=True, TIME_ZONE='UTC'):
+            @params(since=datetime.datetime, since__gte=datetime.datetime(2015, 1, 1), since__lt=datetime.datetime(2016, 1, 1, tzinfo=timezone.utc))
+            def aware_request(request, since):
+                self.assertTrue(timezone.is_aware(since))
+                return Response({'since': since})
+
+            self.assertEqual(self.do_fake_request(aware_request, get={'since': '2015-06-01T12:30:00'})['since'],
+                             datetime.datetime(2015, 6, 1, 12, 30, tzinfo=timezone.utc))
+            self.assertEqual(self.do_fake_request(aware_request, get={'since': '2015-06-01T12:30:00+02:00'})['since'],
+                             datetime.datetime(2015, 6, 1, 10, 30, tzinfo=timezone.utc))
+            self.do_fake_request(aware_request, expected_status_code=400, get={'since': '2014-12-31T23:59:59'})
+            self.do_fake_request(aware_request, expected_status_code=400, get={'since': '2016-01-01T00:00:00'})
+
+        # and both naive with it off, even if the request had an offset
+        self.assertEqual(self.do_fake_request(my_request, get={'since': '2015-06-01T12:30:00+00:00'})['since'].tzinfo, None)
+
+    def test_uuid(self):
+        """ Test UUID params """
+        @params(token=uuid.UUID)
+        def my_request(request, token):
+            return Response({'token': token})
+
+        token = uuid.uuid4()
+        self.assertEqual(self.do_fake_request(my_request, get={'token': str(token)})['token'], token)
+        self.assertEqual(self.do_fake_request(my_request, get={'token': token.hex})['token'], token)
+        self.do_fake_request(my_request, expected_status_code=400, get={'token': 'not-a-uuid'})
+        self.do_fake_request(my_request, expected_status_code=400, get={'token': 'abcdefghijklmnop'})  # not raw UUID bytes
+
+    def test_decimal(self):
+        """ Test Decimal params; range checks should work with a bound of 0 """
+        @params(amount=Decimal, amount__gte=0, amount__lt=Decimal('100.00'))
+        def my_request(request, amount):
+            return Response({'amount': amount})
+
+        self.assertEqual(self.do_fake_request(my_request, get={'amount': '12.50'})['amount'], Decimal('12.50'))
+        self.do_fake_request(my_request, get={'amount': '0'})
+        self.do_fake_request(my_request, expected_status_code=400, get={'amount': '-0.01'})
+        self.do_fake_request(my_request, expected_status_code=400, get={'amount': '100'})
+        self.do_fake_request(my_request, expected_status_code=400, get={'amount': 'NaN'})
+        self.do_fake_request(my_request, expected_status_code=400, get={'amount': 'lots'})
+
+    def test_register_type(self):
+        """ Test that we can register our own param types """
+        class Point(tuple):
+            pass
+
+        def to_point(param):
+            x, y = param.split(':')
+            return Point((float(x), float(y)))
+
+        self.assertRaises(Exception, params, location=Point)
+
+        register_type(Point, to_point)
+
+        @params(location=Point)
+        def my_request(request, location):
+            return Response({'location': location})
+
+        self.assertEqual(self.do_fake_request(my_request, get={'location': '1.5:-2'})['location'], (1.5, -2.0))
+        self.do_fake_request(my_request, expected_status_code=400, get={'location': '1.5'})
+
+        # instances with as_param_type(), like Cursor, don't need to be registered
+        class Prefixed(object):
+            def __init__(self, prefix):
+                self.prefix = prefix
+
+            def as_param_type(self):
+                def convert(param):
+                    if not param.startswith(self.prefix):
+                        raise Exception('must start with %s' % self.prefix)
+                    return param[len(self.prefix):]
+                return ParamType(convert, compare=len, max_raw_length=lambda lower, upper: 10)
+
+        @params(code=Prefixed('ab-'), code__length__lte=3)
+        def prefixed_request(request, code):
+            return Response({'code': code})
+
+        self.assertEqual(self.do_fake_request(prefixed_request, get={'code': 'ab-123'})['code'], '123')
+        self.do_fake_request(prefixed_request, expected_status_code=400, get={'code': 'cd-123'})
+        self.do_fake_request(prefixed_request, expected_status_code=400, get={'code': 'ab-1234'})
+        self.do_fake_request(prefixed_request, expected_status_code=400, get={'code': 'ab-' + '1' * 8})
+
+    def test_cache(self):
+        """ Test that __cache shares lookups through the cache backend, and that saves invalidate them """
+        @params(user=_MockUser, user__cache=True, user__deferred=False)
+        def my_request(request, user):
+            self.assertTrue(isinstance(user, _MockUser))
+            return Response({'name': user.name})
+
+        user = _MockUser.objects.create(name='Cached User')
+        gets, restore = self.count_gets()
+        try:
+            self.assertEqual(self.do_fake_request(my_request, get={'user': user.id})['name'], 'Cached User')
+            self.assertEqual(self.do_fake_request(my_request, get={'user': str(user.id)})['name'], 'Cached User')
+            self.assertEqual(len(gets), 1)
+
+            user.name = 'Renamed User'
+            post_save.send(sender=_MockUser, instance=user, created=False)
+            self.assertEqual(self.do_fake_request(my_request, get={'user': user.id})['name'], 'Renamed User')
+            self.assertEqual(len(gets), 2)
+
+            # missing objects aren't cached
+            self.do_fake_request(my_request, expected_status_code=400, get={'user': 100000})
+            self.do_fake_request(my_request, expected_status_code=400, get={'user': 100000})
+            self.assertEqual(len(gets), 4)
+        finally:
+            restore()
+
+        self.assertRaises(Exception, params, my_int=int, my_int__cache=True)
+
+    def test_cache_transaction(self):
+        """ Test that a lookup after a save is committed isn't stale, even if another worker cached the old row before the commit """
+        @params(user=_MockUser, user__cache=True, user__deferred=False)
+        def my_request(request, user):
+            return Response({'name': user.name})
+
+        user = _MockUser.objects.create(name='Committed User')
+        self.assertEqual(self.do_fake_request(my_request, get={'user': user.id})['name'], 'Committed User')
+
+        # fake transaction.on_commit() (Django 1.9+), running the callbacks when we 'commit'
+        on_commit_callbacks = []
+        real_on_commit = getattr(transaction, 'on_commit', None)
+        transaction.on_commit = lambda fn, using=None: on_commit_callbacks.append(fn)
+        try:
+            post_save.send(sender=_MockUser, instance=user, created=False)  # save() inside atomic(): not committed yet
+            # another worker looks it up before the commit, sees the old row, and caches it under the new version
+            self.assertEqual(self.do_fake_request(my_request, get={'user': user.id})['name'], 'Committed User')
+            user.name = 'Renamed In Transaction'  # commit
+            for fn in on_commit_callbacks:
+                fn()
+        finally:
+            if real_on_commit:
+                transaction.on_commit = real_on_commit
+            else:
+                del transaction.on_commit
+        self.assertEqual(on_commit_callbacks and self.do_fake_request(my_request, get={'user': user.id})['name'], 'Renamed In Transaction')
+
+    def test_cache_file_backend(self):
+        """ Test ModelCache with the file-based backend, and that expired entries are served while someone else refreshes them """
+        user = _MockUser.objects.create(name='File Cached User')
+        model_cache = ModelCache(_MockUser, cache_alias='file', timeout=0)
+        fetches = []
+
+        def fetch():
+            fetches.append(1)
+            return user
+
+        self.assertEqual(model_cache.get(user.id, fetch).id, user.id)
+        self.assertEqual(len(fetches), 1)
+
+        # timeout=0, so the entry is already expired. Pretend another worker is refreshing it: we should get the stale entry
+        caches['file'].add(model_cache._key(user.id) + ':lock', 1)
+        self.assertEqual(model_cache.get(user.id, fetch).id, user.id)
+        self.assertEqual(len(fetches), 1)
+
+        # once the lock is gone, we refresh it ourselves
+        caches['file'].delete(model_cache._key(user.id) + ':lock')
+        self.assertEqual(model_cache.get(user.id, fetch).id, user.id)
+        self.assertEqual(len(fetches), 2)
+
+    def test_memoize(self):
+        """ Test that _memoize caches converted values and errors for non-model params, but still looks up models every time """
+        conversions = []
+
+        class Tag(object):
+            pass
+
+        def to_tag(param):
+            conversions.append(param)
+            if param == 'bad':
+                raise Exception('bad tag')
+            return param
+
+        register_type(Tag, to_tag)
+
+        @params(_memoize=2, tag=Tag, ids=int, ids__many=True, ids__optional=True, user=_MockUser, user__optional=True)
+        def my_request(request, tag, ids, user):
+            if ids:
+                ids.append(-1)  # make sure we can't change the memoized value
+            return Response({'tag': tag, 'ids': ids, 'user': user.id if user else None})
+
+        user = _MockUser.objects.create(name='Memo User')
+        gets, restore = self.count_gets()
+        try:
+            for _ in range(3):
+                self.assertEqual(self.do_fake_request(my_request, get={'tag': 'a', 'ids': '1,2', 'user': user.id}),
+                                 {'tag': 'a', 'ids': [1, 2, -1], 'user': user.id})
+            self.assertEqual(conversions, ['a'])
+            self.assertEqual(len(gets), 3)
+        finally:
+            restore()
+
+        # errors are memoized too
+        for _ in range(3):
+            self.do_fake_request(my_request, expected_status_code=400, get={'tag': 'bad'})
+        self.assertEqual(conversions, ['a', 'bad'])
+
+        # unhashable values just aren't memoized
+        self.do_fake_request(my_request, method='POST', post={'tag': 'b', 'ids': [1, 2]})
+        self.do_fake_request(my_request, method='POST', post={'tag': 'b', 'ids': [1, 2]})
+        self.assertEqual(conversions, ['a', 'bad', 'b', 'b'])
+
+        # max size is 2, so 'c' should evict 'a'
+        self.do_fake_request(my_request, get={'tag': 'c'})
+        self.do_fake_request(my_request, get={'tag': 'a', 'ids': '1,2'})
+        self.assertEqual(conversions, ['a', 'bad', 'b', 'b', 'c', 'a'])
+        stats = my_request.memo.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (4, 4, 2))
+
+        # values that are equal but have different types don't share an entry
+        @params(_memoize=True, flag=bool)
+        def flag_request(request, flag):
+            return Response({'flag': flag})
+
+        self.do_fake_request(flag_request, expected_status_code=400, method='POST', post={'flag': 0.0})
+        self.assertEqual(self.do_fake_request(flag_request, method='POST', post={'flag': False}), {'flag': False})
+        self.assertEqual(self.do_fake_request(flag_request, method='POST', post={'flag': 1}), {'flag': True})
+        self.assertEqual(self.do_fake_request(flag_request, method='POST', post={'flag': True}), {'flag': True})
+
+        # long values aren't memoized
+        long_tag = 'x' * (decorators.MEMOIZE_MAX_VALUE_LENGTH + 1)
+        my_request.memo.clear()
+        self.do_fake_request(my_request, get={'tag': long_tag})
+        self.do_fake_request(my_request, get={'tag': long_tag})
+        self.assertEqual(conversions[-2:], [long_tag, long_tag])
+        self.assertEqual(my_request.memo.stats()['size'], 0)
+
+        self.assertRaises(Exception, params, _not_an_option=True)
+
+    def test_as_object(self):
+        """ Test that _as_object passes a single params object, and tracks which params were supplied """
+        @params(_as_object=True, my_int=int, my_int__default=10, my_str=str, my_str__optional=True, user=_MockUser)
+        def my_request(request, params):
+            self.assertEqual(params._fields, ('my_int', 'my_str', 'user'))
+            return Response({'my_int': params.my_int, 'my_str': params.my_str, 'user': params.user.id,
+                             'supplied': [name for name in params._fields if params._supplied(name)],
+                             'defaulted': [name for name in params._fields if params._defaulted(name)]})
+
+        user = _MockUser.objects.create(name='Object User')
+        self.assertEqual(self.do_fake_request(my_request, get={'user': user.id, 'my_str': 'abc'}),
+                         {'my_int': 10, 'my_str': 'abc', 'user': user.id, 'supplied': ['my_str', 'user'], 'defaulted': ['my_int']})
+        self.assertEqual(self.do_fake_request(my_request, get={'user': user.id, 'my_int': '10'})['supplied'], ['my_int', 'user'])
+        self.do_fake_request(my_request, expected_status_code=400, get={'my_int': 10})
+
+        # works with _memoize, and we can pick the kwarg name
+        @params(_as_object='p', _memoize=True, my_int=int, my_int__default=10, user=_MockUser, user__optional=True)
+        def my_memoized_request(request, p):
+            self.assertFalse(hasattr(p, '__dict__'))
+            return Response({'my_int': p.my_int, 'supplied': p._supplied('my_int'), 'user': p._supplied('user')})
+
+        for _ in range(2):
+            self.assertEqual(self.do_fake_request(my_memoized_request, get={'my_int': 5}), {'my_int': 5, 'supplied': True, 'user': False})
+            self.assertEqual(self.do_fake_request(my_memoized_request, get={'user': user.id}), {'my_int': 10, 'supplied': False, 'user': True})
+
+    def test_max_raw_length(self):
+        """ Test that overly long raw values are rejected before conversion """
+        @params(bounded=int, bounded__gte=-100, bounded__lte=100, bounded__optional=True,
+                unbounded=int, unbounded__optional=True,
+                short=int, short__max_raw_length=3, short__optional=True,
+                code=str, code__length__lte=4, code__optional=True)
+        def my_request(request, bounded, unbounded, short, code):
+            return Response({'status': 'success'})
+
+        self.do_fake_request(my_request, get={'bounded': '-100', 'unbounded': '9' * 1000, 'short': '999', 'code': 'abcd'})
+        self.do_fake_request(my_request, get={'bounded': '0042'})
+
+        for get in {'bounded': '0' * 10 + '1'}, {'unbounded': '9' * 10000}, {'short': '1000'}, {'code': 'a' * 100000}:
+            response = self.do_fake_request(my_request, expected_status_code=400, get=get)
+            self.assertTrue('too long' in response['error'])
+
+        # __many checks each value
+        @params(ids=int, ids__many=True, ids__gte=1, ids__lte=999)
+        def my_many_request(request, ids):
+            return Response({'status': 'success'})
+
+        self.do_fake_request(my_many_request, get={'ids': ','.join(['999'] * 100)})
+        self.do_fake_request(my_many_request, expected_status_code=400, get={'ids': '1,2,' + '3' * 1000})
+
+        # and the number of values, by default and with __max_items
+        conversions = []
+
+        class Counted(object):
+            pass
+
+        register_type(Counted, lambda param: conversions.append(param) or param)
+
+        @params(ids=Counted, ids__many=True, users=_MockUser, users__many=True, users__max_items=2, users__optional=True)
+        def my_count_request(request, ids, users):
+            return Response({'ids': len(ids)})
+
+        user = _MockUser.objects.create(name='Many User')
+        self.assertEqual(self.do_fake_request(my_count_request, get={'ids': ','.join(['1'] * decorators.MANY_MAX_ITEMS)}),
+                         {'ids': decorators.MANY_MAX_ITEMS})
+        del conversions[:]
+        gets, restore = self.count_gets()
+        try:
+            for get in {'ids': ','.join(['1'] * (decorators.MANY_MAX_ITEMS + 1))}, {'ids': '1', 'users': ','.join([str(user.id)] * 3)}:
+                response = self.do_fake_request(my_count_request, expected_status_code=400, get=get)
+                self.assertTrue('Too many values' in response['error'])
+            response = self.do_fake_request(my_count_request, expected_status_code=400, method='POST', post={'ids': [1] * (decorators.MANY_MAX_ITEMS + 1)})
+            self.assertTrue('Too many values' in response['error'])
+            self.assertEqual(gets, [])
+        finally:
+            restore()
+        self.assertEqual(conversions, ['1'])
+        self.assertRaises(Exception, my_count_request.call, None, ids=['1'] * (decorators.MANY_MAX_ITEMS + 1))
+
+        # global limit
+        decorators.MAX_RAW_LENGTH = 50
+        try:
+            self.do_fake_request(my_many_request, expected_status_code=400, get={'ids': ','.join(['999'] * 100)})
+            self.do_fake_request(my_request, expected_status_code=400, get={'unbounded': '9' * 51})
+        finally:
+            decorators.MAX_RAW_LENGTH = None
+
+    def test_check_lookup_fields(self):
+        """ Test the system check for model params looked up by non-unique / non-indexed fields """
+        class Field(object):
+            primary_key = unique = db_index = False
+
+            def __init__(self, name, **kwargs):
+                self.name = self.attname = name
+                for k, v in kwargs.items():
+                    setattr(self, k, v)
+
+        class Options(object):
+            fields = dict((f.name, f) for f in (Field('id', primary_key=True), Field('slug', unique=True), Field('email'), Field('name')))
+            pk = fields['id']
+            index_together = (('email', 'name'),)
+            unique_together = ()
+
+            def get_field(self, name):
+                return self.fields[name]
+
+        class Thing(object):
+            _default_manager = None
+            _meta = Options()
+
+        @params(thing=Thing)
+        def by_id(request, thing):
+            pass
+
+        @params(thing=Thing, thing__field='slug')
+        def by_slug(request, thing):
+            pass
+
+        @params(thing=Thing, thing__field='email')
+        def by_email(request, thing):
+            pass
+
+        @params(thing=Thing, thing__field='name')
+        def by_name(request, thing):
+            pass
+
+        @params(thing=Thing, thing__field='nope')
+        def by_nope(request, thing):
+            pass
+
+        messages = [(m.obj.split('.')[-1], m.id) for m in check_lookup_fields() if m.obj.startswith(__name__)]
+        self.assertEqual(sorted(messages), [('by_email', 'django_rest_params.W001'),
+                                            ('by_name', 'django_rest_params.W001'),
+                                            ('by_name', 'django_rest_params.W002'),
+                                            ('by_nope', 'django_rest_params.E001')])
+
+    def test_check_lookup_fields_url_conf(self):
+        """ Test that the system check finds views that are only imported through ROOT_URLCONF """
+        self.assertFalse('tests.check_urls' in sys.modules)
+        with override_settings(ROOT_URLCONF='tests.check_urls'):
+            messages = [(m.obj, m.id) for m in check_lookup_fields() if m.obj.startswith('tests.check_urls')]
+        self.assertEqual(sorted(messages), [('tests.check_urls.get_book_by_title', 'django_rest_params.W001'),
+                                            ('tests.check_urls.get_book_by_title', 'django_rest_params.W002')])
+
+        # and the check is registered, so manage.py check runs it
+        self.assertTrue(check_lookup_fields in registry.get_checks())
+
+    def test_call(self):
+        """ Test calling a decorated fn directly with plain Python values """
+        @params(user=_MockUser, user__name='user_id', offset=int, offset__gte=0, offset__default=0, colors=('red', 'blue'), colors__many=True)
+        def my_request(request, user, offset, colors, extra=None):
+            return {'request': request, 'user': user, 'offset': offset, 'colors': colors, 'extra': extra}
+
+        user = _MockUser.objects.create(name='Direct User')
+        gets, restore = self.count_gets()
+        try:
+            # already-typed values aren't converted / looked up
+            result = my_request.call(None, user=user, offset=20, colors=['red'], extra='passed through')
+            self.assertEqual(result, {'request': None, 'user': user, 'offset': 20, 'colors': ['red'], 'extra': 'passed through'})
+            self.assertEqual(gets, [])
+
+            # raw values are, just like in a request
+            result = my_request.call('request', user=str(user.id), offset='5', colors='blue')
+            self.assertEqual((result['request'], result['user'], result['offset'], result['colors']), ('request', user, 5, ['blue']))
+            self.assertEqual(len(gets), 1)
+        finally:
+            restore()
+
+        self.assertEqual(my_request.call(None, user=user, colors=('red', 'blue'))['offset'], 0)
+        self.assertRaises(Exception, my_request.call, None, colors=['red'])
+        self.assertRaises(Exception, my_request.call, None, user=user, offset=-1, colors=['red'])
+        self.assertRaises(Exception, my_request.call, None, user=user, colors=['green'])
+
+        # datetimes are made aware/naive like parsed ones, and a datetime isn't a date
+        def make_dated_request():
+            @params(since=datetime.datetime, since__gte=datetime.datetime(2015, 1, 1), day=datetime.date, day__optional=True)
+            def dated_request(request, since, day):
+                return since, day
+            return dated_request
+
+        with override_settings(USE_TZ=True, TIME_ZONE='UTC'):
+            aware_request = make_dated_request()
+            since, _ = aware_request.call(None, since=datetime.datetime(2015, 6, 1))
+            self.assertEqual(since, datetime.datetime(2015, 6, 1, tzinfo=timezone.utc))
+            self.assertRaises(Exception, aware_request.call, None, since=datetime.datetime(2014, 6, 1))
+        dated_request = make_dated_request()
+        self.assertEqual(dated_request.call(None, since=datetime.datetime(2015, 6, 1), day=datetime.date(2015, 6, 2))[1], datetime.date(2015, 6, 2))
+        self.assertRaises(Exception, dated_request.call, None, since=datetime.datetime(2015, 6, 1), day=datetime.datetime(2015, 6, 2))
+
+        # methods + _as_object
+        class MyViewSet(object):
+            @params(_as_object=True, limit=int, limit__default=10)
+            def list(self, request, params):
+                return params
+
+        viewset = MyViewSet()
+        result = MyViewSet.list.call(viewset, None, limit=5)
+        self.assertEqual((result.limit, result._supplied('limit')), (5, True))
+        self.assertEqual(MyViewSet.list.call(viewset, None)._defaulted('limit'), True)
+
+    def test_call_api_view(self):
+        """ Test that .call is still reachable for function views wrapped with @api_view """
+        @params(limit=int, limit__gte=1, limit__default=10)
+        def list_things_impl(request, limit):
+            return Response({'limit': limit})
+
+        list_things = api_view(['GET'])(list_things_impl)
+        self.assertFalse(hasattr(list_things, 'call'))  # @api_view makes a new view, so .call lives on the inner fn
+
+        self.assertEqual(list_things_impl.call(None, limit='5').data, {'limit': 5})
+        self.assertRaises(Exception, list_things_impl.call, None, limit=0)
+
+        # and the wrapped view still works as usual
+        self.assertEqual(list_things(APIRequestFactory().get('/things', {'limit': '5'})).data, {'limit': 5})
+        self.assertEqual(list_things(APIRequestFactory().get('/things', {'limit': '0'})).status_code, 400)
+
+    def test_concurrent(self):
+        """ Test that _concurrent looks up model params at the same time, with the same results and errors as one at a time """
+        def make_view(concurrent):
+            @params(_concurrent=concurrent, owner=_MockUser, owner__field='name', user=_MockUser, friend=_MockUser, friend__optional=True, limit=int)
+            def my_request(request, owner, user, friend, limit):
+                return Response({'owner': owner.id, 'user': user.id, 'friend': friend and friend.id, 'limit': limit})
+            return my_request
+
+        sequential_view, concurrent_view = make_view(False), make_view(True)
+        u1 = _MockUser.objects.create(name='Concurrent 1')
+        u2 = _MockUser.objects.create(name='Concurrent 2')
+        cases = (
+            ({'owner': 'Concurrent 1', 'user': str(u2.id), 'limit': '3'}, 200),
+            ({'owner': 'Concurrent 1', 'user': str(u2.id), 'friend': str(u1.id), 'limit': '3'}, 200),
+            ({'owner': 'Nobody', 'user': '-1', 'limit': '3'}, 400),  # both fail: owner comes first
+            ({'owner': 'Concurrent 1', 'user': '-1', 'limit': '3'}, 400),
+            ({'owner': 'Nobody', 'user': str(u2.id), 'limit': 'x'}, 400),  # bad limit is reported before any lookups
+            ({'user': str(u2.id), 'limit': '3'}, 400),
+        )
+        for get, status_code in cases:
+            self.assertEqual(self.do_fake_request(concurrent_view, status_code, get=get),
+                             self.do_fake_request(sequential_view, status_code, get=get))
+
+        # the lookups overlap instead of running back to back
+        real_get = _MockUserManager.get
+        _MockUserManager.get = lambda manager, **kwargs: time.sleep(0.2) or real_get(manager, **kwargs)
+        try:
+            start = time.time()
+            self.do_fake_request(concurrent_view, get={'owner': 'Concurrent 1', 'user': str(u2.id), 'friend': str(u1.id), 'limit': '3'})
+            self.assertLess(time.time() - start, 0.5)
+        finally:
+            _MockUserManager.get = real_get
+
+        # needs at least two model params to bother
+        self.assertEqual(self.do_fake_request(params(_concurrent=True, user=_MockUser)(lambda request, user: Response({'user': user.id})),
+                                              get={'user': str(u1.id)}), {'user': u1.id})
+
+
+    def test_concurrent_connections(self):
+        """ Test that pool threads keep their DB connections between lookups unless they're broken or older than CONN_MAX_AGE """
+        class FakeConnection(object):
+            def __init__(self, max_age=0, close_at=None, errors_occurred=False, usable=True, autocommit=True):
+                self.connection = object()
+                self.settings_dict = {'CONN_MAX_AGE': max_age, 'AUTOCOMMIT': True}
+                self.close_at = close_at
+                self.errors_occurred = errors_occurred
+                self.usable = usable
+                self.autocommit = autocommit
+
+            def get_autocommit(self):
+                return self.autocommit
+
+            def is_usable(self):
+                return self.usable
+
+            def close(self):
+                self.connection = None
+
+        past = time.time() - 1
+        kept = (FakeConnection(close_at=past), FakeConnection(max_age=None), FakeConnection(max_age=60, close_at=time.time() + 60),
+                FakeConnection(errors_occurred=True))
+        closed = (FakeConnection(max_age=60, close_at=past), FakeConnection(errors_occurred=True, usable=False), FakeConnection(autocommit=False))
+
+        class FakeConnections(object):
+            def all(self):
+                return kept + closed
+
+        real_connections = concurrency.connections
+        concurrency.connections = FakeConnections()
+        try:
+            self.assertEqual(concurrency.run_concurrently([(lambda x: x * 2, 21)]), [(42, None)])
+        finally:
+            concurrency.connections = real_connections
+        self.assertEqual([c.connection is not None for c in kept], [True] * len(kept))
+        self.assertEqual([c.connection is not None for c in closed], [False] * len(closed))
+        self.assertFalse(kept[-1].errors_occurred)
+
 
 if __name__ == '__main__':
     unittest.main()